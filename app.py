@@ -1,13 +1,33 @@
 
-from flask import Flask, request, jsonify, url_for
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context, url_for
 from flask_cors import CORS
 from apscheduler.schedulers.background import BackgroundScheduler
 from database.rds_database import rds_database
+from database.query_cache import query_cache
+from services.steam_api_client import create_session, fetch_changed_game_details
+from services.tag_index import tag_index
+from services.name_index import name_index
+from services.catalog_snapshot import catalog_snapshot
+from services.similarity_index import similarity_index
+from util.http_cache import http_cache
+from util.request_args import parse_batch_ids
+from util import metrics
+from util.request_logging import configure_logging, restart_logging_after_fork
 from models import Steam_API_Management_Model
 from dataclasses import asdict
 # from util import *
-import requests
+import calendar
+import csv
+import datetime
+import fcntl
+import io
+import itertools
+import json
 import logging
+import random
+import socket
+import tempfile
+import threading
 import time
 import os
 from dotenv import load_dotenv
@@ -19,30 +39,373 @@ BASEDIR = os.path.abspath(os.path.dirname(__file__))
 DB_NAME = os.getenv("RDS_DB_NAME")
 STEAM_TOP_100_API = os.getenv("STEAM_TOP_100_API")
 STEAM_GAME_DETAIL_API = os.getenv("STEAM_GAME_DETAIL_API")
-cur_database = rds_database()
-app = Flask(__name__)
-CORS(app) # Enable CORS (allow requests from other domains)
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+STEAM_API_CONCURRENCY = int(os.getenv("STEAM_API_CONCURRENCY", 8))
+STEAM_API_TIMEOUT = float(os.getenv("STEAM_API_TIMEOUT", 10))
+STEAM_API_RETRIES = int(os.getenv("STEAM_API_RETRIES", 3))
+STEAM_API_BACKOFF = float(os.getenv("STEAM_API_BACKOFF", 0.5))
+GAME_DETAILS_MAX_IDS = int(os.getenv("GAME_DETAILS_MAX_IDS", 100))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 300))
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "1") == "1" # serve catalog reads from memory, 0 sends them to the database (through the read cache)
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 300))
+HTTP_COMPRESS_MIN_SIZE = int(os.getenv("HTTP_COMPRESS_MIN_SIZE", 1024))
+HTTP_COMPRESS_CACHE_ENTRIES = int(os.getenv("HTTP_COMPRESS_CACHE_ENTRIES", 256)) # compressed response bodies kept per process, 0 disables
+INGEST_INTERVAL_WEEKS = float(os.getenv("INGEST_INTERVAL_WEEKS", 2))
+INGEST_INTERVAL_HOURS = float(os.getenv("INGEST_INTERVAL_HOURS", 0)) # overrides INGEST_INTERVAL_WEEKS when set, e.g. 1 for hourly runs
+INGEST_MODE = os.getenv("INGEST_MODE", "incremental") # incremental (only new or stale game details) or full (refetch every game)
+STEAM_DETAIL_MAX_AGE_HOURS = float(os.getenv("STEAM_DETAIL_MAX_AGE_HOURS", 24)) # stored details older than this are revalidated
+INGEST_IN_WEB = os.getenv("INGEST_IN_WEB", "0") == "1" # also schedule the ingest job in the gunicorn workers instead of only in ingest_worker.py
+SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "steam_api_scheduler.lock")) # with INGEST_IN_WEB=1, the one worker holding this lock runs the scheduler
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", 30)) # how often web processes check ingest_runs for new data, 0 disables
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json") # json or text
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0)) # share of requests with access logs, errors are always logged
+LOG_BODY_MAX_BYTES = int(os.getenv("LOG_BODY_MAX_BYTES", 0)) # request body bytes to log, 0 disables body capture
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", 64 * 1024)) # export output is sent in chunks of about this size
+WARMUP_MAX_BACKOFF = float(os.getenv("WARMUP_MAX_BACKOFF", 30)) # longest wait in sec between warmup attempts while the database is unreachable
+WARMUP_RETRY_AFTER = int(os.getenv("WARMUP_RETRY_AFTER", 5)) # Retry-After in sec of the 503 sent by index-only routes during warmup
+PROBE_PATHS = ('/healthz', '/readyz') # health probes, left out of the access logs
+# Routes and middleware, registered on the app by create_app
+api = Blueprint('api', __name__)
+# The app and the services it uses, built by create_app. The routes, warmup and ingest functions
+# read them from these module globals; importing this module builds none of them.
+app = None
+cur_database = None
+read_cache = None
+cached_query_one = cached_query_game_detail = cached_query_game_details = None
+cached_query_top_100_game = cached_count_top_100_game = cached_query_game_ids_by_tag = cached_count_games_by_tag = None
+game_tag_index = game_name_index = catalog = game_similarity_index = None
+response_cache = None
+
+
+# App factory for WSGI servers (wsgi.py), ingest_worker.py, the benchmarks and the tests.
+# Builds the connection pool (connections are opened lazily, so this never waits on the database),
+# the read cache, the empty in-memory indexes, logging, the /metrics collectors and HTTP caching.
+# Each process then warms up on its own (start_warmup in gunicorn's post_worker_init, or on its first request).
+#
+# Example usage:
+# app = create_app()
+def create_app():
+    global app, cur_database, read_cache, response_cache
+    global cached_query_one, cached_query_game_detail, cached_query_game_details
+    global cached_query_top_100_game, cached_count_top_100_game, cached_query_game_ids_by_tag, cached_count_games_by_tag
+    global game_tag_index, game_name_index, catalog, game_similarity_index
+    cur_database = rds_database()
+    # read-through cache for the routes, invalidated by fetch_steam_api_data
+    read_cache = query_cache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+    cached_query_one = read_cache.wrap(cur_database.query_one)
+    cached_query_game_detail = read_cache.wrap(cur_database.query_game_detail)
+    cached_query_game_details = read_cache.wrap(cur_database.query_game_details)
+    cached_query_top_100_game = read_cache.wrap(cur_database.query_top_100_game)
+    cached_count_top_100_game = read_cache.wrap(cur_database.count_top_100_game)
+    cached_query_game_ids_by_tag = read_cache.wrap(cur_database.query_game_ids_by_tag)
+    cached_count_games_by_tag = read_cache.wrap(cur_database.count_games_by_tag)
+    # in-memory indexes, built at warmup and rebuilt by fetch_steam_api_data
+    game_tag_index = tag_index()
+    game_name_index = name_index()
+    catalog = catalog_snapshot()
+    game_similarity_index = similarity_index()
+
+    app = Flask(__name__)
+    CORS(app) # Enable CORS (allow requests from other domains)
+    # Configure logging (non-blocking, records are written by a background thread)
+    configure_logging(level=logging.INFO, log_format=LOG_FORMAT)
+    app.register_blueprint(api)
+
+    metrics.registry.add_collector('steam_api_read_cache', 'Read cache counters', 'gauge', ['stat'],
+                                   lambda: {(key,): value for key, value in read_cache.stats().items()})
+    metrics.registry.add_collector('steam_api_db_pool_connections', 'Database connection pool state', 'gauge', ['state'],
+                                   lambda: {(key,): value for key, value in cur_database.pool.stats().items()})
+    metrics.registry.add_collector('steam_api_catalog_snapshot', 'In-memory catalog snapshot size', 'gauge', ['stat'],
+                                   lambda: {(key,): int(value) if key == 'loaded' else value for key, value in catalog.stats().items()})
+    metrics.registry.add_collector('steam_api_similarity_index', 'In-memory similarity index size', 'gauge', ['stat'],
+                                   lambda: {(key,): value for key, value in game_similarity_index.stats().items() if value is not None})
+
+    # Conditional GET and compression keyed on the loaded ingest run
+    # (registered after the blueprint's logging middleware so a 304 is still logged)
+    response_cache = http_cache(
+        app,
+        version=dataset_version,
+        # the export reads the live database, not the loaded ingest run
+        excluded_paths=['/steam_api/cache_stats', '/steam_api/export'],
+        max_age=HTTP_CACHE_MAX_AGE,
+        min_compress_size=HTTP_COMPRESS_MIN_SIZE,
+        compressed_cache_size=HTTP_COMPRESS_CACHE_ENTRIES,
+    )
+    metrics.registry.add_collector('steam_api_http_compressed_cache', 'Compressed response bodies kept for reuse', 'gauge', ['stat'],
+                                   lambda: {(key,): value for key, value in response_cache.stats().items()})
+    return app
+
+
+# call in every forked worker (gunicorn post_fork) before the first request
+def after_fork():
+    restart_logging_after_fork()
+    # None without preload_app, the worker then runs create_app itself after the fork
+    if cur_database is not None:
+        cur_database.after_fork()
+
+
+# Rebuilds every in-memory index from the database. All of them are built first and swapped in
+# together, so a failed read keeps the previous indexes instead of serving some of them empty.
+# Each swap is a single attribute assignment, readers see either the old state or the new one.
+_refresh_lock = threading.Lock()
+
+
+def refresh_indexes():
+    with _refresh_lock:
+        try:
+            # streamed once per index, so the similarity index never holds the whole join as tuples
+            tag_state = game_tag_index.build(cur_database.iter_tag_links())
+            similarity_state = game_similarity_index.build(cur_database.iter_tag_links())
+            name_state = game_name_index.build(cur_database.iter_rows('games', columns=['appid', 'name']))
+            catalog_state = catalog.build(
+                cur_database.iter_rows('games', columns=['appid', 'name', 'ranking']),
+                cur_database.iter_rows('game_tags', columns=['tag_id', 'tag_name']),
+                cur_database.iter_rows('tags_of_games', columns=['appid', 'tag_id', 'weight']),
+            ) if CATALOG_SNAPSHOT else None
+        except Exception as e:
+            app.logger.error(f"Failed to rebuild in-memory indexes, keeping the current ones: {e}")
+            return False
+        app.logger.info(f"Tag index rebuilt with {game_tag_index.swap(tag_state)} games")
+        app.logger.info(f"Similarity index rebuilt with {game_similarity_index.swap(similarity_state)} games")
+        app.logger.info(f"Name index rebuilt with {game_name_index.swap(name_state)} games")
+        if catalog_state is not None:
+            app.logger.info(f"Catalog snapshot rebuilt with {catalog.swap(catalog_state)} games ({catalog.stats()['bytes']} bytes)")
+        return True
+
+
+# Per-process warmup: connect to the database and load the in-memory indexes in a background
+# thread, retrying with backoff while the database is unreachable. The process serves requests
+# (from the database fallbacks) meanwhile, /readyz reports ready once warmup has finished.
+_warmup_lock = threading.Lock()
+_warmup_pid = None
+_loaded_ingest_run = None # {'run_id', 'finished_at'} of the ingest run whose data this process has loaded
+NO_INGEST_RUN = {"run_id": None, "finished_at": None} # loaded data that predates every recorded ingest run
+warmup_status = {"ready": False, "started_at": None, "ready_at": None, "attempts": 0, "last_error": None}
+
+
+def warm_up(max_attempts=None):
+    delay = 1.0
+    global _loaded_ingest_run
+    while True:
+        warmup_status["attempts"] += 1
+        try:
+            cur_database.pool.prefill()
+            # read before loading, so a run finishing meanwhile is still picked up by the poller
+            latest_run = cur_database.query_latest_ingest_run()
+            if refresh_indexes():
+                # reads cached from the database fallbacks meanwhile may be older than the loaded run
+                read_cache.bump_generation()
+                _loaded_ingest_run = latest_run or NO_INGEST_RUN
+                warmup_status.update(ready=True, ready_at=time.time(), last_error=None)
+                app.logger.info(f"Warmup finished in pid {os.getpid()} after {warmup_status['attempts']} attempts")
+                return True
+            warmup_status["last_error"] = "Failed to rebuild in-memory indexes"
+        except Exception as e:
+            warmup_status["last_error"] = str(e)
+            app.logger.warning(f"Warmup attempt {warmup_status['attempts']} failed: {e}")
+        if max_attempts is not None and warmup_status["attempts"] >= max_attempts:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, WARMUP_MAX_BACKOFF)
+
+
+# Start warmup once per process (a forked worker starts its own); background=False warms up in the caller.
+# In the background the same thread then polls ingest_runs for new data every INGEST_POLL_SECONDS.
+def start_warmup(background=True, max_attempts=None):
+    global _warmup_pid
+    with _warmup_lock:
+        if _warmup_pid == os.getpid():
+            return False
+        _warmup_pid = os.getpid()
+        warmup_status.update(ready=False, started_at=time.time(), ready_at=None, attempts=0, last_error=None)
+    if background:
+        threading.Thread(target=warm_up_and_poll, kwargs={"max_attempts": max_attempts}, name="warmup", daemon=True).start()
+    else:
+        warm_up(max_attempts)
+    return True
+
+
+def warm_up_and_poll(max_attempts=None):
+    if warm_up(max_attempts) and INGEST_POLL_SECONDS > 0:
+        poll_ingest_runs()
+
+
+# the index-only routes have no database fallback, until warmup has loaded the indexes they would
+# answer with empty results, so they answer 503 instead
+def warming_up_response():
+    return jsonify({"message": "Service is warming up, try again shortly"}), 503, {"Retry-After": str(WARMUP_RETRY_AFTER), "Cache-Control": "no-store"}
+
+
+# servers without a post-fork hook start the warmup on the first request of each process
+@api.before_app_request
+def ensure_warmup_started():
+    if _warmup_pid != os.getpid():
+        start_warmup()
+
 
 
 # Middleware for logging
-@app.before_request
+@api.before_app_request
 def log_request():
-    request.start_time = time.time() # Record the start time
-    request_data = request.get_data() # Get request data if needed
-    app.logger.info(f'Before Request: Method={request.method}, Path={request.path}, Body={request_data.decode()}')
+    request.start_time = time.perf_counter() # Record the start time
+    request.log_sampled = request.path not in PROBE_PATHS and (LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE)
+    if not request.log_sampled:
+        return
+    fields = {"method": request.method, "path": request.path}
+    # GET/HEAD carry no body worth logging, other bodies are capped at LOG_BODY_MAX_BYTES
+    if LOG_BODY_MAX_BYTES > 0 and request.method not in ('GET', 'HEAD'):
+        fields["body"] = request.get_data()[:LOG_BODY_MAX_BYTES].decode(errors='replace')
+    app.logger.info('Before Request', extra={"fields": fields})
 
 
-@app.after_request
+@api.after_app_request
 def log_response(response):
-    duration = time.time() - request.start_time # Calculate how long the request took
-    app.logger.info(f'After Request: Method={request.method}, Path={request.path}, Status={response.status_code}, Duration={duration:.2f} sec')
+    # sampled-out requests are still logged when they fail
+    if request.log_sampled or response.status_code >= 500:
+        duration = time.perf_counter() - request.start_time # Calculate how long the request took
+        app.logger.info('After Request', extra={"fields": {"method": request.method, "path": request.path, "status": response.status_code, "duration_ms": round(duration * 1000, 3)}})
     return response
 
 
+# Middleware for metrics: latency and SQL statement count per route
+@api.before_app_request
+def start_request_metrics():
+    request.metrics_start_time = time.perf_counter()
+    metrics.start_request()
+
+
+@api.after_app_request
+def record_request_metrics(response):
+    duration = time.perf_counter() - request.metrics_start_time
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.http_request_duration.observe(duration, method=request.method, route=route)
+    metrics.http_requests_total.inc(method=request.method, route=route, status=response.status_code)
+    sql_statements = metrics.finish_request()
+    if sql_statements is not None:
+        metrics.http_request_sql_statements.observe(sql_statements, route=route)
+    return response
+
+
+# Data version for the HTTP validators: the ingest run this process has loaded, so every worker and
+# host serving the same run sends the same ETag and Last-Modified. None until warmup has loaded data.
+def dataset_version():
+    run = _loaded_ingest_run
+    if run is None:
+        return None
+    finished_at = run["finished_at"]
+    # finished_at is naive UTC, like the datetime column
+    last_modified = calendar.timegm(finished_at.timetuple()) if finished_at else None
+    return f"{run['run_id']}:{last_modified}", last_modified
+
+
+
+# Pagination helpers
+# page/per_page paginate by offset, after=<appid> continues from the last appid of the previous page
+def get_pagination_args(default_per_page):
+    page = max(int(request.args.get('page', 1)), 1)
+    per_page = max(int(request.args.get('per_page', default_per_page)), 1)
+    after = request.args.get('after', type=int)
+    return page, per_page, after
+
+
+def pagination_link_args(page, per_page, after):
+    if after is not None:
+        return {"after": after, "per_page": per_page, **expand_link_args()}
+    return {"page": page, "per_page": per_page, **expand_link_args()}
+
+
+def next_page_link_args(page, per_page, after, paginated_game_ids):
+    if after is not None:
+        return {"after": paginated_game_ids[-1], "per_page": per_page, **expand_link_args()}
+    return {"page": page + 1, "per_page": per_page, **expand_link_args()}
+
+
+def prev_page_link_args(page, per_page):
+    return {"page": page - 1, "per_page": per_page, **expand_link_args()}
+
+
+# Expansion helpers
+# expand=detail inlines every game detail field, fields=name,ranking picks some of them
+GAME_DETAIL_FIELDS = ('name', 'ranking', 'tags')
+
+
+def get_expand_fields():
+    if request.args.get('expand') == 'detail':
+        return list(GAME_DETAIL_FIELDS)
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown_fields = [field for field in fields if field not in GAME_DETAIL_FIELDS]
+    if unknown_fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown_fields)}")
+    return fields
+
+
+# Batch id helper
+# ids as a comma separated query parameter (GET) or a JSON list (POST), see util.request_args
+def get_batch_ids():
+    body = request.get_json(silent=True) if request.method == 'POST' else None
+    return parse_batch_ids(request.method, request.args.get('ids'), body, GAME_DETAILS_MAX_IDS)
+
+
+def expand_link_args():
+    return {key: request.args[key] for key in ('expand', 'fields') if key in request.args}
+
+
+# Catalog reads, served from the in-memory snapshot once it is built
+# and from the database (through the read cache) until then
+def get_game_detail_by_id(game_id):
+    if catalog.loaded:
+        return catalog.game(game_id)
+    return cached_query_game_detail(asdict(Steam_API_Management_Model.AppId(appid=game_id)))
+
+
+def get_game_detail_by_name(game_name):
+    if catalog.loaded:
+        return catalog.game_by_name(game_name)
+    return cached_query_game_detail(asdict(Steam_API_Management_Model.GameName(name=game_name)))
+
+
+def get_game_details(game_ids):
+    if catalog.loaded:
+        return catalog.game_details(game_ids)
+    return cached_query_game_details(game_ids)
+
+
+# returns (appids, total)
+def get_top_games(limit, offset, after):
+    if catalog.loaded:
+        return catalog.top_games(limit=limit, offset=offset, after=after)
+    game_list = cached_query_top_100_game(limit=limit, offset=offset, after=after)
+    return [game['appid'] for game in game_list], cached_count_top_100_game()
+
+
+# returns (appids, total), or None when the tag does not exist
+def get_games_by_tag(tag_name, limit, offset, after):
+    if catalog.loaded:
+        return catalog.games_by_tag(tag_name, limit=limit, offset=offset, after=after)
+    tag_info = cached_query_one('game_tags', columns=['tag_id'], conditions=asdict(Steam_API_Management_Model.TagName(tag_name=tag_name)))
+    if not tag_info:
+        return None
+    tag_id = tag_info['tag_id']
+    return cached_query_game_ids_by_tag(tag_id, limit=limit, offset=offset, after=after), cached_count_games_by_tag(tag_id)
+
+
+# replace a page of appids with their details, fetched in one lookup
+def expand_game_ids(game_ids, fields):
+    game_details = get_game_details(game_ids)
+    expanded_games = []
+    for game_id in game_ids:
+        game_detail = game_details.get(game_id, {})
+        expanded_game = {"appid": game_id}
+        expanded_game.update({field: game_detail.get(field) for field in fields})
+        expanded_games.append(expanded_game)
+    return expanded_games
+
+
 # Routes
-@app.route('/')
+@api.route('/')
 def index():
     return jsonify({"message": "Welcome to Steam API Management"}), 200
 
@@ -83,27 +446,21 @@ Example:
         ]
     }
 """
-@app.route("/steam_api/game_detail/<int:gameId>", methods=['GET'])
+@api.route("/steam_api/game_detail/<int:gameId>", methods=['GET'])
 def request_game_detail_by_id(gameId):
     try:
-        game_info = cur_database.query_data('games', columns=['appid', 'name', 'ranking'], conditions=asdict(Steam_API_Management_Model.AppId(appid=gameId)))[0]
+        game_info = get_game_detail_by_id(gameId)
         if not game_info:
             return jsonify({"message": "Game not found"}), 404
-        tag_id_info = cur_database.query_data('tags_of_games', columns=['tag_id'], conditions=asdict(Steam_API_Management_Model.AppId(appid=gameId)))
-        tag_id_info = [tag_id['tag_id'] for tag_id in tag_id_info]
-        tag_name_info = []
-        for tag_id in tag_id_info:
-            tag_name = cur_database.query_data('game_tags', columns=['tag_name'], conditions=asdict(Steam_API_Management_Model.TagId(tag_id=tag_id)))[0]['tag_name']
-            tag_name_info.append(tag_name)
-        game_info['tags'] = tag_name_info
+        tag_name_info = game_info['tags']
 
         # HATEOS
         response = {
             "game_detail": game_info,
             "_links": {
-                "self": url_for('request_game_detail_by_id', gameId=gameId, _external=True),
-                "top_100_game_list_query_example": url_for('request_game_list',page=1, per_page=10, _external=True),
-                "game_list_by_tag_query_example": url_for('request_game_list_by_tag', tagName=tag_name_info[0].replace(" ", "%20"),page=1, per_page=10, _external=True) if tag_name_info else None
+                "self": url_for('.request_game_detail_by_id', gameId=gameId, _external=True),
+                "top_100_game_list_query_example": url_for('.request_game_list',page=1, per_page=10, _external=True),
+                "game_list_by_tag_query_example": url_for('.request_game_list_by_tag', tagName=tag_name_info[0].replace(" ", "%20"),page=1, per_page=10, _external=True) if tag_name_info else None
             }
         }
         return jsonify(response), 200
@@ -150,28 +507,22 @@ Example:
         }
     }
 """
-@app.route("/steam_api/game_detail/<string:gameName>", methods=['GET'])
+@api.route("/steam_api/game_detail/<string:gameName>", methods=['GET'])
 def request_game_detail_by_name(gameName):
     try:
         gameName = gameName.replace("%20", " ")
-        game_info = cur_database.query_data('games', columns=['appid', 'name', 'ranking'], conditions=asdict(Steam_API_Management_Model.GameName(name=gameName)))[0]
+        game_info = get_game_detail_by_name(gameName)
         if not game_info:
             return jsonify({"message": "Game not found"}), 404
-        tag_id_info = cur_database.query_data('tags_of_games', columns=['tag_id'], conditions=asdict(Steam_API_Management_Model.AppId(appid=game_info['appid'])))
-        tag_id_info = [tag_id['tag_id'] for tag_id in tag_id_info]
-        tag_name_info = []
-        for tag_id in tag_id_info:
-            tag_name = cur_database.query_data('game_tags', columns=['tag_name'], conditions=asdict(Steam_API_Management_Model.TagId(tag_id=tag_id)))[0]['tag_name']
-            tag_name_info.append(tag_name)
-        game_info['tags'] = tag_name_info
+        tag_name_info = game_info['tags']
 
         # HATEOS
         response = {
             "game_detail": game_info,
             "_links": {
-                "self": url_for('request_game_detail_by_name', gameName=gameName, _external=True),
-                "top_100_game_list_query_example": url_for('request_game_list', page=1, per_page=10, _external=True),
-                "game_list_by_tag_query_example": url_for('request_game_list_by_tag', tagName=tag_name_info[0].replace(" ", "%20"), page=1, per_page=10, _external=True) if tag_name_info else None
+                "self": url_for('.request_game_detail_by_name', gameName=gameName, _external=True),
+                "top_100_game_list_query_example": url_for('.request_game_list', page=1, per_page=10, _external=True),
+                "game_list_by_tag_query_example": url_for('.request_game_list_by_tag', tagName=tag_name_info[0].replace(" ", "%20"), page=1, per_page=10, _external=True) if tag_name_info else None
             }
         }
         return jsonify(response), 200
@@ -180,11 +531,69 @@ def request_game_detail_by_name(gameName):
         return jsonify({"message": "Failed to fetch game detail"}), 500
 
 
+"""
+Request game details for many games at once (at most GAME_DETAILS_MAX_IDS ids)
+
+GET ids as a comma separated query parameter, or POST them as a JSON body
+
+Returns: dict of game info keyed by appid, plus the requested ids that were not found
+
+Example:
+    /steam_api/game_details?ids=570,730,1
+    (or POST /steam_api/game_details with {"ids": [570, 730, 1]})
+    Response:
+    {
+        "game_details": {
+            "570": {
+                "appid": 570,
+                "name": "Dota 2",
+                "ranking": 1,
+                "tags": [...]
+            },
+            "730": {
+                "appid": 730,
+                "name": "Counter-Strike: Global Offensive",
+                "ranking": 2,
+                "tags": [...]
+            }
+        },
+        "missing": [1]
+    }
+"""
+@api.route("/steam_api/game_details", methods=['GET', 'POST'])
+def request_game_details():
+    try:
+        try:
+            game_ids = get_batch_ids()
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        game_details = get_game_details(game_ids)
+        response = {
+            "game_details": {str(game_id): game_details[game_id] for game_id in game_ids if game_id in game_details},
+            "missing": [game_id for game_id in game_ids if game_id not in game_details],
+            "_links": {
+                "self": url_for('.request_game_details', ids=','.join(str(game_id) for game_id in game_ids), _external=True),
+                "top_100_game_list_query_example": url_for('.request_game_list', page=1, per_page=10, _external=True)
+            }
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game details: {e}")
+        return jsonify({"message": "Failed to fetch game details"}), 500
+
+
 """
 Request game list by tag name (use %20 to replace space in tag name)
 
+Query parameters:
+    page, per_page: offset pagination (default page=1, per_page=10)
+    after: appid of the last game on the previous page, keyset pagination ordered by appid
+    expand=detail: return {appid, name, ranking, tags} objects instead of bare appids
+    fields: comma separated subset of name,ranking,tags to return with each appid
+
 Returns:
-    list: list of game id
+    list: list of game id, plus "total" number of games with the tag
 
 Example:
     /steam_api/game_list_by_tag/FPS
@@ -203,31 +612,34 @@ Example:
         1938090
     ]
     """
-@app.route('/steam_api/game_list_by_tag/<string:tagName>',methods=['GET'])
+@api.route('/steam_api/game_list_by_tag/<string:tagName>',methods=['GET'])
 def request_game_list_by_tag(tagName):
     try:
         tagName = tagName.replace("%20", " ")
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
-        tag_id = cur_database.query_data('game_tags', columns=['tag_id'], conditions=asdict(Steam_API_Management_Model.TagName(tag_name=tagName)))[0]['tag_id']
-        if not tag_id:
-            return jsonify({"message": "Tag not found"}), 404
-        game_id_info = cur_database.query_data('tags_of_games', columns=['appid'], conditions=asdict(Steam_API_Management_Model.TagId(tag_id=tag_id)))
-        game_id_info = [game_id['appid'] for game_id in game_id_info]
+        page, per_page, after = get_pagination_args(default_per_page=10)
+        try:
+            expand_fields = get_expand_fields()
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
 
-        # pagination
+        # one extra game tells whether there is a next page
         start = (page - 1) * per_page
-        end = page * per_page
-        paginated_game_id_info = game_id_info[start:end]
+        games_by_tag = get_games_by_tag(tagName, limit=per_page + 1, offset=start, after=after)
+        if games_by_tag is None:
+            return jsonify({"message": "Tag not found"}), 404
+        game_id_info, total = games_by_tag
+        has_next = len(game_id_info) > per_page
+        paginated_game_id_info = game_id_info[:per_page]
 
         # HATEOS
         response = {
-            "game_list_by_tag": paginated_game_id_info,
+            "game_list_by_tag": expand_game_ids(paginated_game_id_info, expand_fields) if expand_fields else paginated_game_id_info,
+            "total": total,
             "_links": {
-                "self": url_for('request_game_list_by_tag', tagName=tagName, page=page, per_page=per_page, _external=True),
-                "next": url_for('request_game_list_by_tag', tagName=tagName, page=page + 1, per_page=per_page, _external=True) if end < len(game_id_info) else None,
-                "prev": url_for('request_game_list_by_tag', tagName=tagName, page=page - 1, per_page=per_page, _external=True) if start > 0 else None,
-                "game_detail_query_example": url_for('request_game_detail_by_id', gameId=paginated_game_id_info[0], _external=True) if paginated_game_id_info else None
+                "self": url_for('.request_game_list_by_tag', tagName=tagName, **pagination_link_args(page, per_page, after), _external=True),
+                "next": url_for('.request_game_list_by_tag', tagName=tagName, **next_page_link_args(page, per_page, after, paginated_game_id_info), _external=True) if has_next else None,
+                "prev": url_for('.request_game_list_by_tag', tagName=tagName, **prev_page_link_args(page, per_page), _external=True) if after is None and start > 0 else None,
+                "game_detail_query_example": url_for('.request_game_detail_by_id', gameId=paginated_game_id_info[0], _external=True) if paginated_game_id_info else None
             }
         }
         return jsonify(response), 200
@@ -239,7 +651,13 @@ def request_game_list_by_tag(tagName):
 """
 Request top 100 game list
 
-Returns: list of game id
+Query parameters:
+    page, per_page: offset pagination (default page=1, per_page=100)
+    after: appid of the last game on the previous page, keyset pagination ordered by ranking
+    expand=detail: return {appid, name, ranking, tags} objects instead of bare appids
+    fields: comma separated subset of name,ranking,tags to return with each appid
+
+Returns: list of game id, plus "total" number of ranked games
 
 Example:
     /steam_api/game_list
@@ -258,27 +676,30 @@ Example:
         322170
     ]
 """
-@app.route('/steam_api/game_list',methods=['GET'])
+@api.route('/steam_api/game_list',methods=['GET'])
 def request_game_list():
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 100))
-        game_list = cur_database.query_top_100_game()
-        game_list = [game['appid'] for game in game_list]
+        page, per_page, after = get_pagination_args(default_per_page=100)
+        try:
+            expand_fields = get_expand_fields()
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
 
-        # pagination
+        # one extra game tells whether there is a next page
         start = (page - 1) * per_page
-        end = page * per_page
-        paginated_game_list = game_list[start:end]
+        game_list, total = get_top_games(limit=per_page + 1, offset=start, after=after)
+        has_next = len(game_list) > per_page
+        paginated_game_list = game_list[:per_page]
 
         # HATEOS
         response = {
-            "game_list": paginated_game_list,
+            "game_list": expand_game_ids(paginated_game_list, expand_fields) if expand_fields else paginated_game_list,
+            "total": total,
             "_links": {
-                "self": url_for('request_game_list', page=page, per_page=per_page, _external=True),
-                "next": url_for('request_game_list', page=page + 1, per_page=per_page, _external=True) if end < len(game_list) else None,
-                "prev": url_for('request_game_list', page=page - 1, per_page=per_page, _external=True) if start > 0 else None,
-                "game_detail_query_example": url_for('request_game_detail_by_id', gameId=paginated_game_list[0], _external=True) if paginated_game_list else None
+                "self": url_for('.request_game_list', **pagination_link_args(page, per_page, after), _external=True),
+                "next": url_for('.request_game_list', **next_page_link_args(page, per_page, after, paginated_game_list), _external=True) if has_next else None,
+                "prev": url_for('.request_game_list', **prev_page_link_args(page, per_page), _external=True) if after is None and start > 0 else None,
+                "game_detail_query_example": url_for('.request_game_detail_by_id', gameId=paginated_game_list[0], _external=True) if paginated_game_list else None
             }
         }
         return jsonify(response), 200
@@ -287,6 +708,222 @@ def request_game_list():
         return jsonify({"message": "Failed to fetch top 100 games"}), 500
     
 
+"""
+Request games by several tags at once, served from the in-memory tag index
+
+Query parameters:
+    tags: comma separated tag names the games must have
+    exclude: comma separated tag names the games must not have
+    match: all (default, games with every tag) or any (games with at least one tag)
+    order_by: ranking (default), weight (total weight of the requested tags) or appid
+    limit: maximum number of games to return (default 100)
+    expand, fields: same as /steam_api/game_list
+
+Returns: list of game id, plus "total" number of matching games
+
+Example:
+    /steam_api/game_list_by_tags?tags=FPS,Co-op&exclude=Survival
+    Response:
+    {
+        "game_list_by_tags": [
+            730,
+            440,
+            ...
+        ],
+        "total": 12
+    }
+"""
+@api.route('/steam_api/game_list_by_tags', methods=['GET'])
+def request_game_list_by_tags():
+    if not warmup_status["ready"]:
+        return warming_up_response()
+    try:
+        tags = [tag.strip() for tag in request.args.get('tags', '').split(',') if tag.strip()]
+        exclude = [tag.strip() for tag in request.args.get('exclude', '').split(',') if tag.strip()]
+        match = request.args.get('match', 'all')
+        order_by = request.args.get('order_by', 'ranking')
+        limit = max(int(request.args.get('limit', 100)), 1)
+        if not tags and not exclude:
+            return jsonify({"message": "No tags given"}), 400
+        if match not in ('all', 'any'):
+            return jsonify({"message": "match must be all or any"}), 400
+        if order_by not in tag_index.ORDER_BY:
+            return jsonify({"message": f"order_by must be one of {', '.join(tag_index.ORDER_BY)}"}), 400
+        try:
+            expand_fields = get_expand_fields()
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        game_ids, total = game_tag_index.query(tags, exclude=exclude, match=match, order_by=order_by, limit=limit)
+        response = {
+            "game_list_by_tags": expand_game_ids(game_ids, expand_fields) if expand_fields else game_ids,
+            "total": total,
+            "_links": {
+                "self": url_for('.request_game_list_by_tags', **request.args.to_dict(), _external=True),
+                "game_detail_query_example": url_for('.request_game_detail_by_id', gameId=game_ids[0], _external=True) if game_ids else None
+            }
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game list by tags: {e}")
+        return jsonify({"message": "Failed to fetch game list by tags"}), 500
+
+
+"""
+Search games by name, served from the in-memory name index
+
+Query parameters:
+    q: search text
+    mode: prefix (name or word starts with q), fuzzy (trigram similarity, tolerates typos)
+          or auto (default, prefix matches topped up with fuzzy matches)
+    limit: maximum number of results (default 10, at most 100)
+
+Returns: list of appid and name pairs
+
+Example:
+    /steam_api/game_search?q=counter
+    Response:
+    [
+        {
+            "appid": 10,
+            "name": "Counter-Strike"
+        },
+        {
+            "appid": 730,
+            "name": "Counter-Strike: Global Offensive"
+        }
+    ]
+"""
+@api.route('/steam_api/game_search', methods=['GET'])
+def request_game_search():
+    if not warmup_status["ready"]:
+        return warming_up_response()
+    try:
+        query = request.args.get('q', '').strip()
+        mode = request.args.get('mode', 'auto')
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        if not query:
+            return jsonify({"message": "No search text given"}), 400
+        if mode not in name_index.MODES:
+            return jsonify({"message": f"mode must be one of {', '.join(name_index.MODES)}"}), 400
+        games = game_name_index.search(query, mode=mode, limit=limit)
+        return jsonify([{"appid": appid, "name": name} for appid, name in games]), 200
+    except Exception as e:
+        app.logger.error(f"Failed to search games: {e}")
+        return jsonify({"message": "Failed to search games"}), 500
+
+
+"""
+Request the games most similar to a game, by cosine similarity of their tag vote vectors
+
+Query parameters:
+    limit: maximum number of similar games (default 10, at most 100)
+    expand, fields: same as /steam_api/game_list
+
+Returns: list of similar games with their similarity score, most similar first
+
+Example:
+    /steam_api/similar/730?limit=2
+    Response:
+    {
+        "appid": 730,
+        "similar": [
+            {
+                "appid": 10,
+                "score": 0.9312
+            },
+            {
+                "appid": 240,
+                "score": 0.9127
+            }
+        ]
+    }
+"""
+@api.route('/steam_api/similar/<int:gameId>', methods=['GET'])
+def request_similar_games(gameId):
+    if not warmup_status["ready"]:
+        return warming_up_response()
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+            expand_fields = get_expand_fields()
+        except (TypeError, ValueError) as e:
+            return jsonify({"message": f"Invalid parameters: {e}"}), 400
+        similar_games = game_similarity_index.similar([gameId], limit=limit).get(gameId)
+        if similar_games is None:
+            return jsonify({"message": "Game not found"}), 404
+
+        response = {
+            "appid": gameId,
+            "similar": similar_game_list(similar_games, expand_fields),
+            "_links": {
+                "self": url_for('.request_similar_games', gameId=gameId, limit=limit, **expand_link_args(), _external=True),
+                "game_detail": url_for('.request_game_detail_by_id', gameId=gameId, _external=True)
+            }
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch similar games: {e}")
+        return jsonify({"message": "Failed to fetch similar games"}), 500
+
+
+"""
+Request similar games for many games at once (at most GAME_DETAILS_MAX_IDS ids), in one batched computation
+
+GET ids as a comma separated query parameter, or POST them as a JSON body
+Query parameters: limit, expand, fields as for /steam_api/similar/<appid>
+
+Returns: similar games keyed by appid, plus the requested ids that were not found
+
+Example:
+    /steam_api/similar?ids=570,730,1&limit=2
+    Response:
+    {
+        "similar": {
+            "570": [{"appid": 1046930, "score": 0.8841}, {"appid": 1172470, "score": 0.8113}],
+            "730": [{"appid": 10, "score": 0.9312}, {"appid": 240, "score": 0.9127}]
+        },
+        "missing": [1]
+    }
+"""
+@api.route('/steam_api/similar', methods=['GET', 'POST'])
+def request_similar_games_batch():
+    if not warmup_status["ready"]:
+        return warming_up_response()
+    try:
+        try:
+            game_ids = get_batch_ids()
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+            expand_fields = get_expand_fields()
+        except (TypeError, ValueError) as e:
+            return jsonify({"message": f"Invalid parameters: {e}"}), 400
+
+        similar_games = game_similarity_index.similar(game_ids, limit=limit)
+        response = {
+            "similar": {str(game_id): similar_game_list(similar_games[game_id], expand_fields) for game_id in game_ids if game_id in similar_games},
+            "missing": [game_id for game_id in game_ids if game_id not in similar_games],
+            "_links": {
+                "self": url_for('.request_similar_games_batch', ids=','.join(str(game_id) for game_id in game_ids), limit=limit, **expand_link_args(), _external=True)
+            }
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch similar games: {e}")
+        return jsonify({"message": "Failed to fetch similar games"}), 500
+
+
+def similar_game_list(similar_games, expand_fields):
+    if not expand_fields:
+        return [{"appid": appid, "score": score} for appid, score in similar_games]
+    expanded_games = expand_game_ids([appid for appid, _ in similar_games], expand_fields)
+    for expanded_game, (_, score) in zip(expanded_games, similar_games):
+        expanded_game["score"] = score
+    return expanded_games
+
+
 """
 Request all game names
 
@@ -299,103 +936,381 @@ Example:
         
     ]
 """
-@app.route('/steam_api/game_name_list', methods=['GET'])
+@api.route('/steam_api/game_name_list', methods=['GET'])
 def request_game_name_list():
     try:
-        game_name_list = cur_database.query_data('games', columns=['name'])
-        game_name_list = sorted([game['name'] for game in game_name_list])
+        # pre-serialized by the catalog snapshot
+        if catalog.loaded:
+            return Response(catalog.name_list_json(), mimetype='application/json'), 200
+        # streamed from the database and cached already sorted
+        game_name_list = read_cache.get_or_load(('game_name_list',), lambda: sorted(cur_database.query_column('games', 'name', unbuffered=True)))
         return jsonify(game_name_list), 200
     except Exception as e:
         app.logger.error(f"Failed to fetch game names: {e}")
         return jsonify({"message": "Failed to fetch game names"}), 500
     
 
-@app.route('/steam_api/game_tag_list', methods=['GET'])
+@api.route('/steam_api/game_tag_list', methods=['GET'])
 def request_game_tag_list():
     try:
-        tag_list = cur_database.query_data('game_tags', columns=['tag_name'])
-        tag_list = sorted([tag['tag_name'] for tag in tag_list])
+        if catalog.loaded:
+            return Response(catalog.tag_list_json(), mimetype='application/json'), 200
+        tag_list = read_cache.get_or_load(('game_tag_list',), lambda: sorted(cur_database.query_column('game_tags', 'tag_name')))
         return jsonify(tag_list), 200
     except Exception as e:
         app.logger.error(f"Failed to fetch game tags: {e}")
         return jsonify({"message": "Failed to fetch game tags"}), 500
 
 
-@app.errorhandler(404)
+"""
+Export the whole catalog as a stream, one game per line
+
+Query parameters:
+    format: ndjson (default) or csv
+    since: only games whose name, ranking or tags changed at or after this ISO date/time (UTC, e.g. 2024-10-01T00:00:00)
+    tag: only games with this tag
+    ranked: 1 for only the top 100 games
+
+Returns: every matching game with its ranking and tags (tag weights are the Steam vote counts), ordered by appid.
+CSV has the columns appid, name, ranking, detail_fetched_at, tags, last_changed_at with tags joined by "|".
+
+Example:
+    /steam_api/export?format=ndjson&tag=FPS
+    Response:
+    {"appid": 10, "name": "Counter-Strike", "ranking": 46, "detail_fetched_at": "2024-10-15T08:00:00", "last_changed_at": "2024-10-01T08:00:00", "tags": [{"tag_name": "FPS", "weight": 5521.0}, ...]}
+    {"appid": 730, "name": "Counter-Strike: Global Offensive", "ranking": 2, "detail_fetched_at": "2024-10-15T08:00:00", "last_changed_at": "2024-10-15T08:00:00", "tags": [...]}
+    ...
+"""
+@api.route('/steam_api/export', methods=['GET'])
+def request_export():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"message": "format must be ndjson or csv"}), 400
+    since = request.args.get('since')
+    try:
+        since = datetime.datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({"message": "since must be an ISO date or date/time"}), 400
+    tag = request.args.get('tag') or None
+    ranked = request.args.get('ranked') in ('1', 'true')
+
+    games = cur_database.iter_game_export(since=since, tag=tag, ranked=ranked)
+    # run the query and read the first game before the status line goes out,
+    # so an unreachable database is a 500 instead of an empty export
+    try:
+        first_game = next(games, None)
+    except Exception as e:
+        app.logger.error(f"Failed to export games: {e}")
+        return jsonify({"message": "Failed to export games"}), 500
+    format_game = format_export_csv if export_format == 'csv' else format_export_ndjson
+
+    def generate():
+        # one game in memory at a time, lines are batched into chunks to keep the number of writes low
+        chunk = ['appid,name,ranking,detail_fetched_at,tags,last_changed_at\r\n'] if export_format == 'csv' else []
+        chunk_size = 0
+        try:
+            for game in itertools.chain([first_game] if first_game is not None else [], games):
+                line = format_game(game)
+                chunk.append(line)
+                chunk_size += len(line)
+                if chunk_size >= EXPORT_CHUNK_BYTES:
+                    yield ''.join(chunk)
+                    chunk = []
+                    chunk_size = 0
+            yield ''.join(chunk)
+        except Exception as e:
+            # the status line is already sent, so a failure can only cut the stream short
+            app.logger.error(f"Failed to export games: {e}")
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson')
+    # returns the cursor to the pool also when the client goes away before the stream starts
+    response.call_on_close(games.close)
+    if export_format == 'csv':
+        response.headers['Content-Disposition'] = 'attachment; filename=games.csv'
+    return response
+
+
+def format_export_ndjson(game):
+    detail_fetched_at = game['detail_fetched_at']
+    last_changed_at = game['last_changed_at']
+    return json.dumps({
+        **game,
+        "detail_fetched_at": detail_fetched_at.isoformat() if detail_fetched_at else None,
+        "last_changed_at": last_changed_at.isoformat() if last_changed_at else None,
+    }) + '\n'
+
+
+def format_export_csv(game):
+    buffer = io.StringIO()
+    detail_fetched_at = game['detail_fetched_at']
+    last_changed_at = game['last_changed_at']
+    csv.writer(buffer).writerow([
+        game['appid'],
+        game['name'],
+        game['ranking'],
+        detail_fetched_at.isoformat() if detail_fetched_at else '',
+        '|'.join(tag_info['tag_name'] for tag_info in game['tags']),
+        last_changed_at.isoformat() if last_changed_at else '',
+    ])
+    return buffer.getvalue()
+
+
+"""
+Liveness probe: the process is up and serving requests, never touches the database
+
+Example:
+    /healthz
+    Response:
+    {
+        "status": "ok"
+    }
+"""
+@api.route('/healthz', methods=['GET'])
+def request_healthz():
+    return jsonify({"status": "ok"}), 200
+
+
+"""
+Readiness probe: 200 once this process has reached the database and loaded its in-memory indexes,
+503 while warmup is still running; reads the warmup state only, never queries the database
+
+Example:
+    /readyz
+    Response:
+    {
+        "attempts": 1,
+        "last_error": null,
+        "ready": true,
+        "ready_at": 1729150001.2,
+        "started_at": 1729150000.4
+    }
+"""
+@api.route('/readyz', methods=['GET'])
+def request_readyz():
+    return jsonify(warmup_status), 200 if warmup_status["ready"] else 503
+
+
+"""
+Request read cache statistics
+
+Returns: dict of cache counters
+
+Example:
+    /steam_api/cache_stats
+    Response:
+    {
+        "evictions": 0,
+        "expirations": 3,
+        "generation": 1,
+        "generation_updated_at": 1729150000.0,
+        "hits": 1520,
+        "maxsize": 1024,
+        "misses": 41,
+        "size": 38,
+        "ttl": 300.0
+    }
+"""
+@api.route('/steam_api/cache_stats', methods=['GET'])
+def request_cache_stats():
+    return jsonify(read_cache.stats()), 200
+
+
+"""
+Request service metrics in the Prometheus text format
+
+Example:
+    /metrics
+    Response:
+    # HELP steam_api_http_request_duration_seconds HTTP request latency by route
+    # TYPE steam_api_http_request_duration_seconds histogram
+    steam_api_http_request_duration_seconds_bucket{method="GET",route="/steam_api/game_list",le="0.001"} 0
+    ...
+"""
+@api.route('/metrics', methods=['GET'])
+def request_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@api.app_errorhandler(404)
 def page_not_found(e):
     return jsonify({"message": "Page not found"}), 404
 
-def fetch_steam_api_data():
-    app.logger.info("Fetching top 100 games data from Steam API")
-    try:
-        response = requests.get(STEAM_TOP_100_API)
-        if response.status_code == 200:
-            data = response.json()
-            # set rank to 101 for all games for upcoming update
-            result = cur_database.update_data("games", asdict(Steam_API_Management_Model.Ranking(ranking=101)), {})
-            if result != "Success":
-                app.logger.error("Failed to reset rank", result)
-                return
-            
-            # fetch game detail data for each game from Steam API
-            ranking = 0
-            for game in data:
-                ranking += 1
-                try:
-                    game_detail_response = requests.get(STEAM_GAME_DETAIL_API + str(game))
-                    if game_detail_response.status_code == 200:
-                        # insert new game into database
-                        game_detail = game_detail_response.json()
-                        game_exist = cur_database.check_data_exist("games", asdict(Steam_API_Management_Model.AppId(appid=game_detail['appid'])))
-                        if game_exist:
-                            app.logger.info("appid:", game_detail['appid'], "game exist. update rank")
-                            game_insert_result = cur_database.update_data("games", asdict(Steam_API_Management_Model.Ranking(ranking=ranking)), asdict(Steam_API_Management_Model.AppId(appid=game_detail['appid'])))
-                        else:
-                            app.logger.info("appid:", game_detail['appid'], "game not exist. insert new game")
-                            game_insert_result = cur_database.bulk_insert_data("games", [asdict(Steam_API_Management_Model.Game(appid=game_detail['appid'], name=game_detail['name'], ranking=ranking))])          
-                        if game_insert_result != "Success":
-                            app.logger.error("Failed to update rank:", game_insert_result)
-                            return
-                            
-                        # insert new tags into database
-                        tags = game_detail['tags']
-                        tags_data = []
-                        for tag in tags.keys():
-                            tag_exist = cur_database.check_data_exist("game_tags", asdict(Steam_API_Management_Model.TagName(tag_name=tag)))
-                            if not tag_exist:
-                                tags_data.append(asdict(Steam_API_Management_Model.TagName(tag_name=tag)))
-
-                        if tags_data:
-                            tag_insert_result = cur_database.bulk_insert_data("game_tags", tags_data)
-                            if tag_insert_result != "Success":
-                                app.logger.error("Failed to insert new tags:", tag_insert_result)
-                                return
-
-                        # update game-tag relationship
-                        game_tag_relationships = []
-                        for tag in tags.keys():
-                            tag_id = cur_database.query_data("game_tags", ['tag_id'], asdict(Steam_API_Management_Model.TagName(tag_name=tag)))[0]['tag_id']
-                            game_tag_relationship_exist = cur_database.check_data_exist("tags_of_games", asdict(Steam_API_Management_Model.TagsOfGames(appid=game_detail['appid'], tag_id=tag_id)))
-                            if not game_tag_relationship_exist:
-                                game_tag_relationships.append(asdict(Steam_API_Management_Model.TagsOfGames(appid=game_detail['appid'], tag_id=tag_id)))
-                        
-                        if game_tag_relationships:
-                            game_tag_relationship_insert_result = cur_database.bulk_insert_data("tags_of_games", game_tag_relationships)
-                            if game_tag_relationship_insert_result != "Success":
-                                app.logger.error("Failed to insert game-tag relationship:", game_tag_relationship_insert_result)
-                                return
-                    else:
-                        app.logger.warning("API Error: Failed to fetch game detail data from Steam API", game_detail_response.status_code)
-                except Exception as e:
-                    app.logger.error(f"Internal Error: Failed to fetch game detail data from Steam API - {e}")
+# a stored game needs its details fetched again when they were never fetched or are older than the max age
+def needs_detail_refresh(stored_game, now):
+    if INGEST_MODE == 'full' or stored_game is None or stored_game['detail_fetched_at'] is None:
+        return True
+    return now - stored_game['detail_fetched_at'] > datetime.timedelta(hours=STEAM_DETAIL_MAX_AGE_HOURS)
+
+
+def ingest_top_100_games(session, run):
+    with metrics.ingest_stage('fetch_top_100'):
+        response = session.get(STEAM_TOP_100_API, timeout=STEAM_API_TIMEOUT)
+    if response.status_code != 200:
+        run.update(status="failed", data_changed=False, error=f"Top 100 request failed with status {response.status_code}")
+        app.logger.warning(f"API Error: Failed to fetch top 100 games data from Steam API - status {response.status_code}")
+        return
+    data = response.json()
+    rankings = {int(game): ranking for ranking, game in enumerate(data, start=1)}
+
+    # diff the new list against the stored rankings, only new or stale games need their details
+    with metrics.ingest_stage('diff'):
+        stored_games = cur_database.query_ingest_state(list(rankings))
+    if stored_games is None:
+        run.update(status="failed", data_changed=False, error="Failed to read the stored games")
+        app.logger.error("Failed to read the stored games, keeping the current top 100 games")
+        return
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0) # naive UTC, like the datetime column
+    refresh_appids = [appid for appid in rankings if needs_detail_refresh(stored_games.get(appid), now)]
+    # revalidate stored details with the validators of their last fetch (full mode refetches unconditionally)
+    validators = {} if INGEST_MODE == 'full' else {
+        appid: (stored_games[appid]['detail_etag'], stored_games[appid]['detail_last_modified'])
+        for appid in refresh_appids if appid in stored_games
+    }
+    with metrics.ingest_stage('fetch_details'):
+        game_detail_results = fetch_changed_game_details(session, STEAM_GAME_DETAIL_API, refresh_appids, validators=validators,
+                                                         concurrency=STEAM_API_CONCURRENCY, timeout=STEAM_API_TIMEOUT)
+
+    # stage all changes first, then apply them in one transaction
+    staged_games = []
+    tags_by_game = {}
+    unchanged_appids = []
+    for appid, (status_code, game_detail, etag, last_modified) in zip(refresh_appids, game_detail_results):
+        if status_code == 200 and game_detail:
+            game = asdict(Steam_API_Management_Model.Game(appid=appid, name=game_detail['name'], ranking=rankings[appid]))
+            game.update({"detail_fetched_at": now, "detail_etag": etag, "detail_last_modified": last_modified})
+            staged_games.append(game)
+            # tag name -> vote count, stored as the link weight
+            # (Steam returns an empty list instead of a dict for games without tags)
+            tags = game_detail.get('tags') or {}
+            tags_by_game[appid] = dict(tags) if isinstance(tags, dict) else {}
+        elif status_code == 304:
+            unchanged_appids.append(appid)
         else:
-            app.logger.warning("API Error: Failed to fetch top 100 games data from Steam API", response.status_code)
-    except Exception as e:
-        app.logger.error(f"Internal Error: Failed to fetch top 100 games data from Steam API - {e}")
-            
+            app.logger.warning(f"API Error: Failed to fetch game detail data from Steam API for appid {appid} - status {status_code}")
 
-if __name__ == '__main__':
+    staged_appids = {game['appid'] for game in staged_games}
+    ranking_changes = {
+        appid: ranking for appid, ranking in rankings.items()
+        if appid in stored_games and appid not in staged_appids and stored_games[appid]['ranking'] != ranking
+    }
+    demoted_appids = [
+        appid for appid, stored_game in stored_games.items()
+        if appid not in rankings and stored_game['ranking'] is not None and stored_game['ranking'] <= 100
+    ]
+    if not staged_appids and not any(appid in stored_games for appid in rankings):
+        run.update(status="failed", data_changed=False, error="No game detail data fetched")
+        app.logger.error("No game detail data fetched, keeping the current top 100 games")
+        return
+    run.update(games_refetched=len(staged_games), games_unchanged=len(unchanged_appids),
+               rankings_changed=len(ranking_changes), games_demoted=len(demoted_appids))
+
+    with metrics.ingest_stage('store'):
+        result = cur_database.apply_top_100_changes(staged_games, ranking_changes, demoted_appids, tags_by_game,
+                                                    checked_appids=unchanged_appids, checked_at=now, stats=run)
+    if result != "Success":
+        run.update(status="failed", error=f"Failed to store top 100 games: {result}")
+        app.logger.error(f"Failed to store top 100 games: {result}")
+        return
+    data_changed = bool(staged_games or ranking_changes or demoted_appids)
+    run.update(status="success" if data_changed else "unchanged", data_changed=data_changed)
+    app.logger.info(f"Stored top 100 games from Steam API: {len(staged_games)} refetched, {len(unchanged_appids)} unchanged, "
+                    f"{len(ranking_changes)} rankings changed, {len(demoted_appids)} dropped out")
+
+
+# Runs the ingest job once, unless another process in the cluster holds the ingest lock.
+# Every run is recorded in ingest_runs. refresh_local=False leaves this process's read cache and
+# indexes alone (ingest_worker.py); web processes pick the new data up from ingest_runs instead.
+# Returns the recorded run, or None when the run was skipped.
+def fetch_steam_api_data(refresh_local=True):
+    with cur_database.ingest_lock() as locked:
+        if not locked:
+            app.logger.info("Ingest already running in another process, skipping this run")
+            return None
+        app.logger.info(f"Fetching top 100 games data from Steam API ({INGEST_MODE})")
+        ingest_start = time.perf_counter()
+        run_id = cur_database.start_ingest_run(INGEST_MODE, socket.gethostname())
+        # assume a change until the diff shows otherwise, so a failed run still drops cached reads
+        run = {"status": "failed", "mode": INGEST_MODE, "data_changed": True, "error": None}
+        session = create_session(concurrency=STEAM_API_CONCURRENCY, retries=STEAM_API_RETRIES, backoff_factor=STEAM_API_BACKOFF)
+        try:
+            ingest_top_100_games(session, run)
+        except Exception as e:
+            run.update(status="failed", data_changed=True, error=str(e))
+            app.logger.error(f"Internal Error: Failed to fetch top 100 games data from Steam API - {e}")
+        finally:
+            session.close()
+            run["duration_seconds"] = round(time.perf_counter() - ingest_start, 3)
+            # whole seconds, so this process and the ones reading the row back agree on the HTTP validators
+            run["finished_at"] = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+            cur_database.finish_ingest_run(run_id, run)
+            if refresh_local:
+                if run["data_changed"]:
+                    load_ingest_run({"run_id": run_id, "finished_at": run["finished_at"]})
+                else:
+                    app.logger.info("Top 100 games unchanged, keeping the read cache and indexes")
+            metrics.ingest_duration.observe(run["duration_seconds"])
+            metrics.ingest_last_run_timestamp.set(time.time())
+    return run
+
+
+# Web processes follow the ingest runs: after a run that changed the data, drop cached reads
+# at once and rebuild the in-memory indexes.
+def load_ingest_run(run):
+    global _loaded_ingest_run
+    generation = read_cache.bump_generation()
+    app.logger.info(f"Read cache invalidated, generation={generation}")
+    with metrics.ingest_stage('refresh_indexes'):
+        if refresh_indexes():
+            _loaded_ingest_run = run
+
+
+def poll_ingest_runs():
+    while True:
+        time.sleep(INGEST_POLL_SECONDS)
+        latest_run = cur_database.query_latest_ingest_run()
+        if latest_run is not None and latest_run['run_id'] != _loaded_ingest_run['run_id']:
+            app.logger.info(f"Loading data of ingest run {latest_run['run_id']} (finished at {latest_run['finished_at']})")
+            load_ingest_run(latest_run)
+
+
+# Scheduler for the ingest job in this process (development server, ingest_worker.py, or one gunicorn
+# worker per host with INGEST_IN_WEB=1). The ingest lock still lets one run at a time through cluster-wide.
+def add_ingest_job(scheduler, **trigger_args):
+    if INGEST_INTERVAL_HOURS > 0:
+        scheduler.add_job(fetch_steam_api_data, 'interval', hours=INGEST_INTERVAL_HOURS, **trigger_args)
+    else:
+        scheduler.add_job(fetch_steam_api_data, 'interval', weeks=INGEST_INTERVAL_WEEKS, **trigger_args)
+
+
+def start_scheduler():
     scheduler = BackgroundScheduler()
-    scheduler.add_job(fetch_steam_api_data, 'interval', weeks=2)
+    add_ingest_job(scheduler)
     scheduler.start()
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+    app.logger.info(f"Scheduler started in pid {os.getpid()}")
+    return scheduler
+
+
+# With INGEST_IN_WEB=1 the scheduler runs in one gunicorn worker only: every worker waits in a
+# background thread for an flock on SCHEDULER_LOCK_FILE, and the worker that gets it starts the
+# scheduler. The lock is released when that worker exits, and a waiting worker takes over.
+_scheduler_lock_file = None
+
+
+def start_scheduler_in_one_process():
+    def wait_for_lock():
+        global _scheduler_lock_file
+        lock_file = open(SCHEDULER_LOCK_FILE, 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # kept open for the life of the process, closing it would release the lock
+        _scheduler_lock_file = lock_file
+        start_scheduler()
+
+    threading.Thread(target=wait_for_lock, name="scheduler-lock", daemon=True).start()
+
+
+if __name__ == '__main__':
+    # development server only, production runs gunicorn -c gunicorn.conf.py wsgi:app
+    create_app()
+    start_warmup()
+    start_scheduler()
+    app.run(debug=os.getenv("FLASK_DEBUG") == "1", use_reloader=False, port=5000, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,247 @@
+from quart import Quart, request, jsonify, url_for
+from quart_cors import cors
+from database.async_rds_database import async_rds_database
+from database.query_cache import query_cache
+from models import Steam_API_Management_Model
+from util.request_args import parse_batch_ids
+from dataclasses import asdict
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+
+
+# Async serving mode: the read routes of app.py on an ASGI server, backed by an aiomysql pool,
+# so slow clients and database I/O do not each hold a worker thread.
+#   uvicorn async_app:app --host 0.0.0.0 --port 5000 --workers 4
+# The ingest job runs in ingest_worker.py; like the WSGI workers, each process polls ingest_runs
+# every INGEST_POLL_SECONDS and drops its cached reads after a run that changed the data.
+
+# Setup
+load_dotenv()
+GAME_DETAILS_MAX_IDS = int(os.getenv("GAME_DETAILS_MAX_IDS", 100))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 300))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", 30)) # how often to check ingest_runs for new data, 0 disables
+cur_database = async_rds_database()
+# read-through cache, invalidated by poll_ingest_runs (entries also expire after CACHE_TTL_SECONDS)
+read_cache = query_cache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+cached_query_one = read_cache.wrap_async(cur_database.query_one)
+cached_query_column = read_cache.wrap_async(cur_database.query_column)
+cached_query_game_detail = read_cache.wrap_async(cur_database.query_game_detail)
+cached_query_game_details = read_cache.wrap_async(cur_database.query_game_details)
+cached_query_top_100_game = read_cache.wrap_async(cur_database.query_top_100_game)
+cached_count_top_100_game = read_cache.wrap_async(cur_database.count_top_100_game)
+cached_query_game_ids_by_tag = read_cache.wrap_async(cur_database.query_game_ids_by_tag)
+cached_count_games_by_tag = read_cache.wrap_async(cur_database.count_games_by_tag)
+app = Quart(__name__)
+app = cors(app, allow_origin="*") # Enable CORS (allow requests from other domains)
+logging.basicConfig(level=logging.INFO)
+
+
+_loaded_ingest_run_id = None # ingest_runs.run_id whose data the read cache holds
+_poll_task = None
+
+
+@app.before_serving
+async def open_database():
+    global _poll_task
+    await cur_database.connect()
+    if INGEST_POLL_SECONDS > 0:
+        _poll_task = asyncio.ensure_future(poll_ingest_runs())
+
+
+@app.after_serving
+async def close_database():
+    if _poll_task is not None:
+        _poll_task.cancel()
+    await cur_database.close()
+
+
+# Drop cached reads once a new ingest run that changed the data shows up in ingest_runs
+async def poll_ingest_runs():
+    global _loaded_ingest_run_id
+    while True:
+        latest_run = await cur_database.query_latest_ingest_run()
+        if latest_run is not None and latest_run['run_id'] != _loaded_ingest_run_id:
+            generation = read_cache.bump_generation()
+            _loaded_ingest_run_id = latest_run['run_id']
+            app.logger.info(f"Ingest run {latest_run['run_id']} found, read cache invalidated, generation={generation}")
+        await asyncio.sleep(INGEST_POLL_SECONDS)
+
+
+def get_pagination_args(default_per_page):
+    page = max(int(request.args.get('page', 1)), 1)
+    per_page = max(int(request.args.get('per_page', default_per_page)), 1)
+    after = request.args.get('after', type=int)
+    return page, per_page, after
+
+
+def pagination_link_args(page, per_page, after):
+    if after is not None:
+        return {"after": after, "per_page": per_page}
+    return {"page": page, "per_page": per_page}
+
+
+def next_page_link_args(page, per_page, after, paginated_game_ids):
+    if after is not None:
+        return {"after": paginated_game_ids[-1], "per_page": per_page}
+    return {"page": page + 1, "per_page": per_page}
+
+
+# Routes (same paths and responses as app.py)
+@app.route('/')
+async def index():
+    return jsonify({"message": "Welcome to Steam API Management"}), 200
+
+
+@app.route("/steam_api/game_detail/<int:gameId>", methods=['GET'])
+async def request_game_detail_by_id(gameId):
+    try:
+        game_info = await cached_query_game_detail(asdict(Steam_API_Management_Model.AppId(appid=gameId)))
+        if not game_info:
+            return jsonify({"message": "Game not found"}), 404
+        return jsonify(game_detail_response(game_info, url_for('request_game_detail_by_id', gameId=gameId, _external=True))), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game detail: {e}")
+        return jsonify({"message": "Failed to fetch game detail"}), 500
+
+
+@app.route("/steam_api/game_detail/<string:gameName>", methods=['GET'])
+async def request_game_detail_by_name(gameName):
+    try:
+        gameName = gameName.replace("%20", " ")
+        game_info = await cached_query_game_detail(asdict(Steam_API_Management_Model.GameName(name=gameName)))
+        if not game_info:
+            return jsonify({"message": "Game not found"}), 404
+        return jsonify(game_detail_response(game_info, url_for('request_game_detail_by_name', gameName=gameName, _external=True))), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game detail: {e}")
+        return jsonify({"message": "Failed to fetch game detail"}), 500
+
+
+def game_detail_response(game_info, self_link):
+    tag_name_info = game_info['tags']
+    # HATEOS
+    return {
+        "game_detail": game_info,
+        "_links": {
+            "self": self_link,
+            "top_100_game_list_query_example": url_for('request_game_list', page=1, per_page=10, _external=True),
+            "game_list_by_tag_query_example": url_for('request_game_list_by_tag', tagName=tag_name_info[0].replace(" ", "%20"), page=1, per_page=10, _external=True) if tag_name_info else None
+        }
+    }
+
+
+@app.route("/steam_api/game_details", methods=['GET', 'POST'])
+async def request_game_details():
+    try:
+        try:
+            body = await request.get_json(silent=True) if request.method == 'POST' else None
+            game_ids = parse_batch_ids(request.method, request.args.get('ids'), body, GAME_DETAILS_MAX_IDS)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        game_details = await cached_query_game_details(game_ids)
+        response = {
+            "game_details": {str(game_id): game_details[game_id] for game_id in game_ids if game_id in game_details},
+            "missing": [game_id for game_id in game_ids if game_id not in game_details],
+            "_links": {
+                "self": url_for('request_game_details', ids=','.join(str(game_id) for game_id in game_ids), _external=True)
+            }
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game details: {e}")
+        return jsonify({"message": "Failed to fetch game details"}), 500
+
+
+@app.route('/steam_api/game_list_by_tag/<string:tagName>', methods=['GET'])
+async def request_game_list_by_tag(tagName):
+    try:
+        tagName = tagName.replace("%20", " ")
+        page, per_page, after = get_pagination_args(default_per_page=10)
+        tag_info = await cached_query_one('game_tags', columns=['tag_id'], conditions=asdict(Steam_API_Management_Model.TagName(tag_name=tagName)))
+        if not tag_info:
+            return jsonify({"message": "Tag not found"}), 404
+        tag_id = tag_info['tag_id']
+
+        # the page and the total count are independent queries, run them concurrently
+        start = (page - 1) * per_page
+        game_id_info, total = await asyncio.gather(
+            cached_query_game_ids_by_tag(tag_id, limit=per_page + 1, offset=start, after=after),
+            cached_count_games_by_tag(tag_id),
+        )
+        has_next = len(game_id_info) > per_page
+        paginated_game_id_info = game_id_info[:per_page]
+
+        # HATEOS
+        response = {
+            "game_list_by_tag": paginated_game_id_info,
+            "total": total,
+            "_links": {
+                "self": url_for('request_game_list_by_tag', tagName=tagName, **pagination_link_args(page, per_page, after), _external=True),
+                "next": url_for('request_game_list_by_tag', tagName=tagName, **next_page_link_args(page, per_page, after, paginated_game_id_info), _external=True) if has_next else None,
+                "prev": url_for('request_game_list_by_tag', tagName=tagName, page=page - 1, per_page=per_page, _external=True) if after is None and start > 0 else None,
+                "game_detail_query_example": url_for('request_game_detail_by_id', gameId=paginated_game_id_info[0], _external=True) if paginated_game_id_info else None
+            }
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game list by tag: {e}")
+        return jsonify({"message": "Failed to fetch game list by tag"}), 500
+
+
+@app.route('/steam_api/game_list', methods=['GET'])
+async def request_game_list():
+    try:
+        page, per_page, after = get_pagination_args(default_per_page=100)
+        start = (page - 1) * per_page
+        game_list, total = await asyncio.gather(
+            cached_query_top_100_game(limit=per_page + 1, offset=start, after=after),
+            cached_count_top_100_game(),
+        )
+        game_list = [game['appid'] for game in game_list]
+        has_next = len(game_list) > per_page
+        paginated_game_list = game_list[:per_page]
+
+        # HATEOS
+        response = {
+            "game_list": paginated_game_list,
+            "total": total,
+            "_links": {
+                "self": url_for('request_game_list', **pagination_link_args(page, per_page, after), _external=True),
+                "next": url_for('request_game_list', **next_page_link_args(page, per_page, after, paginated_game_list), _external=True) if has_next else None,
+                "prev": url_for('request_game_list', page=page - 1, per_page=per_page, _external=True) if after is None and start > 0 else None,
+                "game_detail_query_example": url_for('request_game_detail_by_id', gameId=paginated_game_list[0], _external=True) if paginated_game_list else None
+            }
+        }
+        return jsonify(response), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch top 100 games: {e}")
+        return jsonify({"message": "Failed to fetch top 100 games"}), 500
+
+
+@app.route('/steam_api/game_name_list', methods=['GET'])
+async def request_game_name_list():
+    try:
+        game_name_list = sorted(await cached_query_column('games', 'name'))
+        return jsonify(game_name_list), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game names: {e}")
+        return jsonify({"message": "Failed to fetch game names"}), 500
+
+
+@app.route('/steam_api/game_tag_list', methods=['GET'])
+async def request_game_tag_list():
+    try:
+        tag_list = sorted(await cached_query_column('game_tags', 'tag_name'))
+        return jsonify(tag_list), 200
+    except Exception as e:
+        app.logger.error(f"Failed to fetch game tags: {e}")
+        return jsonify({"message": "Failed to fetch game tags"}), 500
+
+
+@app.errorhandler(404)
+async def page_not_found(e):
+    return jsonify({"message": "Page not found"}), 404
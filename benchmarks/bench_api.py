@@ -0,0 +1,98 @@
+"""
+Per-endpoint throughput and p50/p95/p99 latency of the Flask API against a seeded local MySQL.
+
+Requests go through Flask's test client (no network), from --concurrency threads, so the numbers
+measure the app and the database rather than the HTTP server. Seed the database first with
+benchmarks.seed_catalog and point the RDS_* environment variables at it.
+
+Example:
+    python -m benchmarks.seed_catalog --games 1000 --tags 500
+    python -m benchmarks.bench_api --requests 2000 --concurrency 8 --output bench_api.json
+    python -m benchmarks.bench_api --no-cache   # no catalog snapshot and no read cache, every request goes to the database
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from benchmarks.common import run_metadata, summarize, write_results
+
+
+def build_endpoints(api, rng):
+    games = api.cur_database.query_data('games', columns=['appid', 'name'])
+    tags = [tag['tag_name'] for tag in api.cur_database.query_data('game_tags', columns=['tag_name'])]
+    if not games or not tags:
+        raise SystemExit("The database is empty, run python -m benchmarks.seed_catalog first")
+    appids = [game['appid'] for game in games]
+    names = [game['name'] for game in games]
+    return {
+        "game_detail_by_id": lambda: f"/steam_api/game_detail/{rng.choice(appids)}",
+        "game_detail_by_name": lambda: f"/steam_api/game_detail/{quote(rng.choice(names))}",
+        "game_list": lambda: f"/steam_api/game_list?page={rng.randint(1, 10)}&per_page=10",
+        "game_list_by_tag": lambda: f"/steam_api/game_list_by_tag/{quote(rng.choice(tags))}?page={rng.randint(1, 5)}&per_page=10",
+        "game_name_list": lambda: "/steam_api/game_name_list",
+        "game_tag_list": lambda: "/steam_api/game_tag_list",
+    }
+
+
+def run_endpoint(app, make_path, requests, concurrency, warmup):
+    clients = threading.local()
+    paths = [make_path() for _ in range(requests + warmup)]
+
+    def timed_get(path):
+        if not hasattr(clients, 'client'):
+            clients.client = app.test_client()
+        start = time.perf_counter()
+        response = clients.client.get(path)
+        return time.perf_counter() - start, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_get, paths[:warmup]))
+        start = time.perf_counter()
+        results = list(executor.map(timed_get, paths[warmup:]))
+        elapsed = time.perf_counter() - start
+
+    summary = summarize([latency for latency, _ in results], elapsed)
+    summary["errors"] = sum(1 for _, status_code in results if status_code >= 500)
+    summary["not_found"] = sum(1 for _, status_code in results if status_code == 404)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', default='', help='comma separated subset of endpoints to run')
+    parser.add_argument('--no-cache', action='store_true', help='disable the catalog snapshot and the read cache (CATALOG_SNAPSHOT=0, CACHE_TTL_SECONDS=0)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='-', help='JSON output file, - for stdout')
+    args = parser.parse_args()
+
+    # configure the app before importing it, it reads its settings at import time
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+    if args.no_cache:
+        os.environ["CATALOG_SNAPSHOT"] = "0"
+        os.environ["CACHE_TTL_SECONDS"] = "0"
+    import app as api
+    flask_app = api.create_app()
+    api.start_warmup(background=False, max_attempts=1)
+
+    rng = random.Random(args.seed)
+    endpoints = build_endpoints(api, rng)
+    selected = [name for name in args.endpoints.split(',') if name] or list(endpoints)
+
+    results = {"meta": run_metadata(), "config": vars(args), "endpoints": {}}
+    for name in selected:
+        print(f"Benchmarking {name} ...")
+        results["endpoints"][name] = run_endpoint(flask_app, endpoints[name], args.requests, args.concurrency, args.warmup)
+    results["catalog"] = {"games": len(api.cur_database.query_data('games', columns=['appid'])), "tags": len(api.cur_database.query_data('game_tags', columns=['tag_id']))}
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+End-to-end fetch_steam_api_data time against the local stub of the Steam endpoints.
+
+Starts benchmarks.stub_steam_server in-process, points STEAM_TOP_100_API / STEAM_GAME_DETAIL_API
+at it and runs the ingest job --runs times against the local MySQL from the RDS_* variables.
+Per-stage timings come from the ingest metrics in util.metrics.
+
+Example:
+    python -m benchmarks.bench_ingest --runs 3 --latency-ms 150 --output bench_ingest.json
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.common import run_metadata, summarize, write_results
+from benchmarks.stub_steam_server import stub_steam_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--games', type=int, default=100, help='games in the stub top 100 list')
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='stub delay per Steam request')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='-', help='JSON output file, - for stdout')
+    args = parser.parse_args()
+
+    stub = stub_steam_server(games=args.games, tags=args.tags, latency_ms=args.latency_ms, seed=args.seed).start()
+    # configure the app before importing it, it reads its settings at import time
+    os.environ["STEAM_TOP_100_API"] = stub.top_100_api
+    os.environ["STEAM_GAME_DETAIL_API"] = stub.game_detail_api
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+    import app as api
+    from util import metrics
+    api.create_app()
+    api.start_warmup(background=False, max_attempts=1)
+
+    runs = []
+    try:
+        for run in range(args.runs):
+            requests_before = stub.requests
+            start = time.perf_counter()
+            api.fetch_steam_api_data()
+            duration = time.perf_counter() - start
+            stages = {key[0]: round(value, 4) for key, value in metrics.ingest_last_stage_duration.values().items()}
+            runs.append({"run": run + 1, "duration_sec": round(duration, 4), "steam_requests": stub.requests - requests_before, "stages_sec": stages})
+            print(f"Run {run + 1}: {duration:.2f} sec")
+    finally:
+        stub.stop()
+
+    durations = [run["duration_sec"] for run in runs]
+    summary = summarize(durations, sum(durations))
+    results = {
+        "meta": run_metadata(),
+        "config": vars(args),
+        "ingest": {
+            "runs": runs,
+            "mean_sec": round(summary["mean_ms"] / 1000, 4) if runs else None,
+            "max_sec": round(summary["max_ms"] / 1000, 4) if runs else None,
+        },
+    }
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# latency summary in milliseconds
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+    }
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=False).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "git_commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(results, output):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output and output != '-':
+        with open(output, 'w') as output_file:
+            output_file.write(text + '\n')
+        print(f"Results written to {output}")
+    else:
+        print(text)
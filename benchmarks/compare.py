@@ -0,0 +1,60 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Exits with status 1 when any endpoint's p95/p99 latency grew, or its throughput dropped,
+by more than --threshold (relative), or when the mean ingest time grew by more than that.
+
+Example:
+    python -m benchmarks.compare baseline.json bench_api.json --threshold 0.10
+"""
+
+import argparse
+import json
+import sys
+
+
+def relative_change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+
+    regressions = []
+    for name, before in baseline.get("endpoints", {}).items():
+        after = candidate.get("endpoints", {}).get(name)
+        if after is None:
+            continue
+        # higher is worse for latency, lower is worse for throughput
+        checks = [("p95_ms", 1), ("p99_ms", 1), ("throughput_rps", -1)]
+        for key, direction in checks:
+            change = relative_change(before.get(key), after.get(key))
+            if change is None:
+                continue
+            print(f"{name:24} {key:15} {before[key]:>12} -> {after[key]:>12} ({change:+.1%})")
+            if change * direction > args.threshold:
+                regressions.append(f"{name} {key}")
+
+    before_ingest, after_ingest = baseline.get("ingest", {}), candidate.get("ingest", {})
+    change = relative_change(before_ingest.get("mean_sec"), after_ingest.get("mean_sec"))
+    if change is not None:
+        print(f"{'ingest':24} {'mean_sec':15} {before_ingest['mean_sec']:>12} -> {after_ingest['mean_sec']:>12} ({change:+.1%})")
+        if change > args.threshold:
+            regressions.append("ingest mean_sec")
+
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Seed a local MySQL database with a synthetic catalog for benchmarking.
+
+Applies the schema migrations (database.migrations), empties the tables and inserts
+--games games (the first 100 ranked 1..100, the rest ranked 101), --tags tags and
+--tags-per-game weighted tag links per game. Connection settings come from the same
+RDS_* environment variables as the app, so point them at a local MySQL, never at RDS.
+
+Example:
+    RDS_HOST=127.0.0.1 RDS_PORT=3306 RDS_USER=root RDS_PASSWORD=root RDS_DB_NAME=steam_bench \
+        python -m benchmarks.seed_catalog --games 100000 --tags 500
+"""
+
+import argparse
+import os
+import random
+import time
+
+import pymysql
+from dotenv import load_dotenv
+
+from database import migrations
+
+
+WORDS = ["Counter", "Strike", "Dota", "Team", "Fortress", "Legends", "Battle", "Royale", "Space", "Empire",
+         "Dark", "Souls", "Farm", "Simulator", "Racing", "Tactics", "Kingdom", "Survival", "Island", "Quest"]
+BATCH_SIZE = 5000
+
+
+def connect():
+    load_dotenv()
+    return pymysql.connect(host=os.getenv("RDS_HOST"), port=int(os.getenv("RDS_PORT", 3306)), user=os.getenv("RDS_USER"),
+                           passwd=os.getenv("RDS_PASSWORD"), db=os.getenv("RDS_DB_NAME"), autocommit=False)
+
+
+def insert_batches(cursor, sql, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def seed(games, tags, tags_per_game, seed_value):
+    rng = random.Random(seed_value)
+    conn = connect()
+    start = time.perf_counter()
+    try:
+        migrations.upgrade(conn)
+        with conn.cursor() as cursor:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in ("tags_of_games", "game_tags", "games"):
+                cursor.execute(f"TRUNCATE TABLE {table}")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+            tag_rows = [(tag_id, f"Tag {tag_id}") for tag_id in range(1, tags + 1)]
+            insert_batches(cursor, "INSERT INTO game_tags (tag_id, tag_name) VALUES (%s, %s)", tag_rows)
+
+            appids = rng.sample(range(10, games * 20), games)
+            game_rows = []
+            for index, appid in enumerate(appids):
+                name = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f" {appid}"
+                game_rows.append((appid, name, index + 1 if index < 100 else 101))
+            insert_batches(cursor, "INSERT INTO games (appid, name, ranking) VALUES (%s, %s, %s)", game_rows)
+
+            # skewed tag popularity, like real Steam tags ("Action" is on most games)
+            tag_weights = [1.0 / rank for rank in range(1, tags + 1)]
+            link_rows = []
+            for appid in appids:
+                game_tags = set()
+                while len(game_tags) < min(tags_per_game, tags):
+                    game_tags.update(rng.choices(range(1, tags + 1), weights=tag_weights, k=tags_per_game))
+                for tag_id in list(game_tags)[:tags_per_game]:
+                    link_rows.append((tag_id, appid, float(rng.randint(1, 5000))))
+            insert_batches(cursor, "INSERT INTO tags_of_games (tag_id, appid, weight) VALUES (%s, %s, %s)", link_rows)
+        conn.commit()
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+    print(f"Seeded {games} games, {tags} tags and {games * min(tags_per_game, tags)} tag links in {elapsed:.1f} sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--tags-per-game', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    seed(args.games, args.tags, args.tags_per_game, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Local stand-in for the Steam top-100 and game detail endpoints, for benchmarking the ingest job.
+
+    GET /top100              -> {"<appid>": {"appid": <appid>, ...}, ...} in ranking order
+    GET /appdetails?appid=N  -> {"appid": N, "name": "...", "tags": {"<tag>": <votes>, ...}}
+                                with an ETag, and a bodyless 304 when If-None-Match matches it
+
+Responses are deterministic for a given seed; --latency-ms adds a fixed delay per request
+to mimic the real API's round trip, --fail-first answers the first N detail requests of every
+game with 503 to exercise the client's retries.
+
+Example:
+    python -m benchmarks.stub_steam_server --port 8099 --latency-ms 150
+    STEAM_TOP_100_API=http://127.0.0.1:8099/top100 \
+    STEAM_GAME_DETAIL_API=http://127.0.0.1:8099/appdetails?appid= python app.py
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class stub_steam_server:
+    def __init__(self, port=0, games=100, tags=500, tags_per_game=20, latency_ms=0.0, seed=42, fail_first=0):
+        rng = random.Random(seed)
+        self.latency = latency_ms / 1000
+        self.fail_first = fail_first
+        self.detail_requests = {}  # appid -> detail requests received
+        self.appids = rng.sample(range(10, 2000000), games)
+        self.details = {}
+        for appid in self.appids:
+            tag_ids = rng.sample(range(1, tags + 1), min(tags_per_game, tags))
+            self.details[appid] = {
+                "appid": appid,
+                "name": f"Stub Game {appid}",
+                "tags": {f"Tag {tag_id}": rng.randint(1, 5000) for tag_id in tag_ids},
+            }
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def top_100_api(self):
+        return f"http://127.0.0.1:{self.port}/top100"
+
+    @property
+    def game_detail_api(self):
+        return f"http://127.0.0.1:{self.port}/appdetails?appid="
+
+    def _handler(self):
+        stub = self
+
+        class handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                if url.path == '/top100':
+                    self._send(200, {str(appid): {"appid": appid} for appid in stub.appids})
+                elif url.path == '/appdetails':
+                    appid = int(parse_qs(url.query).get('appid', ['0'])[0])
+                    with stub._lock:
+                        stub.detail_requests[appid] = stub.detail_requests.get(appid, 0) + 1
+                        failing = stub.detail_requests[appid] <= stub.fail_first
+                    if failing:
+                        self._send(503, {})
+                        return
+                    detail = stub.details.get(appid)
+                    if not detail:
+                        self._send(404, {})
+                        return
+                    etag = '"' + hashlib.sha1(json.dumps(detail, sort_keys=True).encode()).hexdigest() + '"'
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+                    self._send(200, detail, {'ETag': etag})
+                else:
+                    self._send(404, {})
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--fail-first', type=int, default=0, help='detail requests per game answered with 503 before succeeding')
+    args = parser.parse_args()
+    stub = stub_steam_server(args.port, games=args.games, tags=args.tags, latency_ms=args.latency_ms, seed=args.seed, fail_first=args.fail_first)
+    print(f"Stub Steam API on {stub.top_100_api} and {stub.game_detail_api}<appid>")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
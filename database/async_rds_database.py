@@ -0,0 +1,210 @@
+"""
+Async mirror of rds_database for the ASGI app (async_app.py), backed by an aiomysql pool.
+Same tables (see database/rds_database.py), same method names and return values, as coroutines.
+"""
+
+import asyncio
+import aiomysql
+from database import sql_builder
+from dotenv import load_dotenv
+import os
+
+
+
+load_dotenv()
+HOST = os.getenv("RDS_HOST")
+PORT = os.getenv("RDS_PORT")
+USER = os.getenv("RDS_USER")
+PASSWORD = os.getenv("RDS_PASSWORD")
+DB_NAME = os.getenv("RDS_DB_NAME")
+POOL_MIN_SIZE = int(os.getenv("RDS_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.getenv("RDS_POOL_MAX_SIZE", 10))
+POOL_RECYCLE = int(os.getenv("RDS_POOL_RECYCLE", 3600))
+
+
+class async_rds_database:
+    def __init__(self):
+        self.pool = None
+
+    async def connect(self):
+        # autocommit so pooled connections never hold a stale read snapshot between requests
+        self.pool = await aiomysql.create_pool(
+            host=HOST, port=int(PORT), user=USER, password=PASSWORD, db=DB_NAME,
+            minsize=POOL_MIN_SIZE, maxsize=POOL_MAX_SIZE, pool_recycle=POOL_RECYCLE, autocommit=True,
+        )
+        print("AWS RDS async connection pool established successfully!")
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+            print("AWS RDS async connection pool closed successfully!")
+
+    async def _fetchall(self, sql, values=None):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, values)
+                records = await cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        return records, columns
+
+    # Example usage:
+    # await self.check_data_exist('users', {'username': 'alice'})
+    async def check_data_exist(self, table_name, conditions):
+        try:
+            sql = sql_builder.exists_sql(table_name, tuple(conditions.keys()))
+            records, _ = await self._fetchall(sql, list(conditions.values()))
+            return len(records) > 0
+        except Exception as e:
+            return str(e)
+
+    # Example usage:
+    # await self.exists('games', {'appid': 570})
+    async def exists(self, table_name, conditions):
+        return await self.check_data_exist(table_name, conditions) is True
+
+    # Example usage:
+    # await self.query_one('game_tags', columns=['tag_id'], conditions={'tag_name': 'FPS'})
+    # None when nothing matches, database errors are raised like in rds_database
+    async def query_one(self, table_name, columns=None, conditions=None):
+        sql = sql_builder.select_one_sql(table_name, tuple(columns or ()), tuple((conditions or {}).keys()))
+        records, columns = await self._fetchall(sql, list((conditions or {}).values()) or None)
+        return dict(zip(columns, records[0])) if records else None
+
+    # Example usage:
+    # await self.query_column('game_tags', 'tag_name')
+    async def query_column(self, table_name, column, conditions=None):
+        sql = sql_builder.select_sql(table_name, (column,), tuple((conditions or {}).keys()))
+        records, _ = await self._fetchall(sql, list((conditions or {}).values()) or None)
+        return [record[0] for record in records]
+
+    # Example usage:
+    # await self.bulk_insert_data('users', [{'username': 'alice', 'age': 30}, {'username': 'bob', 'age': 25}])
+    async def bulk_insert_data(self, table_name, records):
+        if not records:
+            return "No records to insert."
+        values = [tuple(record.values()) for record in records]
+        try:
+            sql = sql_builder.insert_sql(table_name, tuple(records[0].keys()))
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(sql, values)
+            print(f"Successfully inserted {len(records)} records into {table_name}.")
+            return "Success"
+        except Exception as e:
+            print(f"Error inserting records: {e}")
+            return str(e)
+
+    # Example usage:
+    # await self.update_data('users', {'age': 31}, {'username': 'alice'})
+    async def update_data(self, table_name, set_values, conditions):
+        values = list(set_values.values()) + list(conditions.values())
+        try:
+            sql = sql_builder.update_sql(table_name, tuple(set_values.keys()), tuple(conditions.keys()))
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(sql, values)
+            print(f"Successfully updated records in {table_name}.")
+            return "Success"
+        except Exception as e:
+            print(f"Error updating records: {e}")
+            return str(e)
+
+    # Example usage:
+    # await self.query_data('users', columns=['username', 'age'], conditions={'username': 'alice'})
+    async def query_data(self, table_name, columns=None, conditions=None):
+        values = list(conditions.values()) if conditions else None
+        try:
+            sql = sql_builder.select_sql(table_name, tuple(columns or ()), tuple((conditions or {}).keys()))
+            records, columns = await self._fetchall(sql, values)
+            return [dict(zip(columns, record)) for record in records]
+        except Exception as e:
+            print(f"Error querying data: {e}")
+            return []
+
+    async def query_top_100_game(self, limit=None, offset=0, after=None):
+        sql = "SELECT appid FROM games WHERE ranking <= 100"
+        values = []
+        if after is not None:
+            sql += " AND ranking > (SELECT ranking FROM games WHERE appid = %s)"
+            values.append(after)
+        sql += " ORDER BY ranking, appid"
+        if limit is not None:
+            sql += " LIMIT %s OFFSET %s"
+            values += [limit, 0 if after is not None else offset]
+        # database errors are raised like in rds_database
+        records, columns = await self._fetchall(sql, values)
+        return [dict(zip(columns, record)) for record in records]
+
+    async def count_top_100_game(self):
+        records, _ = await self._fetchall("SELECT COUNT(*) FROM games WHERE ranking <= 100")
+        return records[0][0]
+
+    async def query_game_ids_by_tag(self, tag_id, limit, offset=0, after=None):
+        sql = "SELECT appid FROM tags_of_games WHERE tag_id = %s"
+        values = [tag_id]
+        if after is not None:
+            sql += " AND appid > %s"
+            values.append(after)
+        sql += " ORDER BY appid LIMIT %s OFFSET %s"
+        values += [limit, 0 if after is not None else offset]
+        records, _ = await self._fetchall(sql, values)
+        return [record[0] for record in records]
+
+    async def count_games_by_tag(self, tag_id):
+        records, _ = await self._fetchall("SELECT COUNT(*) FROM tags_of_games WHERE tag_id = %s", [tag_id])
+        return records[0][0]
+
+    # Example usage:
+    # await self.query_game_detail({'appid': 730})
+    # await self.query_game_detail({'name': 'Counter-Strike'})
+    # None when no game matches, database errors are raised like in rds_database
+    async def query_game_detail(self, conditions):
+        if list(conditions.keys()) == ['appid']:
+            # the appid is known up front, so the game row and its tags are fetched concurrently
+            (game_records, _), (tag_records, _) = await asyncio.gather(
+                self._fetchall("SELECT appid, name, ranking FROM games WHERE appid = %s", [conditions['appid']]),
+                self._fetchall(
+                    "SELECT gt.tag_name FROM tags_of_games tog JOIN game_tags gt ON gt.tag_id = tog.tag_id "
+                    "WHERE tog.appid = %s ORDER BY tog.weight DESC, tog.tag_id",
+                    [conditions['appid']],
+                ),
+            )
+            if not game_records:
+                return None
+            appid, name, ranking = game_records[0]
+            return {"appid": appid, "name": name, "ranking": ranking, "tags": [record[0] for record in tag_records]}
+
+        records, _ = await self._fetchall(sql_builder.game_detail_sql(tuple(conditions.keys())), list(conditions.values()))
+        if not records:
+            return None
+        appid, name, ranking, _ = records[0]
+        tags = [record[3] for record in records if record[0] == appid and record[3] is not None]
+        return {"appid": appid, "name": name, "ranking": ranking, "tags": tags}
+
+    # Example usage:
+    # await self.query_game_details([570, 730])
+    # appids that do not exist are left out, database errors are raised like in rds_database
+    async def query_game_details(self, appids):
+        if not appids:
+            return {}
+        sql = sql_builder.game_details_sql(len(appids))
+        records, _ = await self._fetchall(sql, list(appids))
+        game_details = {}
+        for appid, name, ranking, tag_name in records:
+            game_detail = game_details.setdefault(appid, {"appid": appid, "name": name, "ranking": ranking, "tags": []})
+            if tag_name is not None:
+                game_detail['tags'].append(tag_name)
+        return game_details
+
+    # Example usage:
+    # await self.query_latest_ingest_run()
+    # {'run_id': 42, 'finished_at': datetime(...)}: the last run that changed the data, None when there is none (or on errors)
+    async def query_latest_ingest_run(self):
+        try:
+            records, _ = await self._fetchall("SELECT run_id, finished_at FROM ingest_runs WHERE data_changed = 1 ORDER BY run_id DESC LIMIT 1")
+            return {"run_id": records[0][0], "finished_at": records[0][1]} if records else None
+        except Exception as e:
+            print(f"Error querying the latest ingest run: {e}")
+            return None
@@ -0,0 +1,142 @@
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Thread-safe pool of pymysql connections.
+# Connections are opened on first use (or ahead of it with prefill), handed out LIFO so the
+# warmest ones are reused first, and only connections that sat idle longer than
+# idle_check_seconds are pinged on checkout.
+#
+# Example usage:
+# pool = connection_pool(lambda: pymysql.connect(...), min_size=1, max_size=10)
+# pool.prefill()
+# with pool.cursor() as cursor:
+#     cursor.execute("SELECT 1")
+class connection_pool:
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, idle_check_seconds=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_check_seconds = idle_check_seconds
+        self._cond = threading.Condition()
+        self._idle = collections.deque()  # (connection, last_used)
+        self._size = 0
+
+    # open connections until the pool holds min_size, raises if the database is unreachable
+    def prefill(self):
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            self.release(conn)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # reserve a slot, the connection is opened outside the lock
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available within {self.timeout} sec")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                return self._connect()
+            # health check only connections that have been idle for a while
+            if time.monotonic() - last_used > self.idle_check_seconds:
+                conn.ping(reconnect=True)
+            return conn
+        except Exception:
+            if conn is not None:
+                self._close_quietly(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._close_quietly(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    # a fresh cursor per call, so concurrent threads never share cursor state
+    @contextmanager
+    def cursor(self, cursor_class=None):
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_class) if cursor_class else conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    # In a forked child the inherited sockets are shared with the parent and its other children,
+    # so drop them without closing (closing would send COM_QUIT on the shared connection).
+    def reset_after_fork(self):
+        self._cond = threading.Condition()
+        self._idle = collections.deque()
+        self._size = 0
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle), "max_size": self.max_size}
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
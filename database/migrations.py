@@ -0,0 +1,260 @@
+"""
+Versioned schema migrations for the games / game_tags / tags_of_games tables.
+
+Applied migrations are recorded in schema_migrations, and every step checks information_schema
+before it changes anything, so `upgrade` can run on every deploy (see the Dockerfile) and a
+migration interrupted halfway (MySQL DDL is not transactional) simply resumes. A named lock
+keeps concurrent deploys from migrating at the same time.
+
+Example:
+    python -m database.migrations upgrade   # apply pending migrations
+    python -m database.migrations status    # list applied and pending migrations
+    python -m database.migrations check     # EXPLAIN the hot queries, exit 1 if an index is missing
+"""
+
+import argparse
+import sys
+
+from database import sql_builder
+
+
+LOCK_NAME = 'steam_api_schema_migrations'
+LOCK_TIMEOUT_SECONDS = 60
+
+
+def _column_exists(cursor, table_name, column_name):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        [table_name, column_name],
+    )
+    return cursor.fetchone() is not None
+
+
+def _index_exists(cursor, table_name, index_name):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        [table_name, index_name],
+    )
+    return cursor.fetchone() is not None
+
+
+def _add_column(cursor, table_name, column_name, definition):
+    if not _column_exists(cursor, table_name, column_name):
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+
+
+def _add_index(cursor, table_name, index_name, columns, unique=False):
+    if not _index_exists(cursor, table_name, index_name):
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} ON {table_name} ({', '.join(columns)})")
+
+
+def _create_base_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS games
+        (
+            appid int not null primary key,
+            name varchar(255) not null,
+            ranking int null
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS game_tags
+        (
+            tag_id int auto_increment primary key,
+            tag_name varchar(255) not null
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tags_of_games
+        (
+            tag_id int not null,
+            appid  int not null,
+            weight float null,
+            primary key (appid, tag_id),
+            constraint game_appid_fk
+                foreign key (appid) references games (appid)
+                    on delete cascade,
+            constraint game_tag_id_fk
+                foreign key (tag_id) references game_tags (tag_id)
+                    on delete cascade
+        )
+    """)
+
+
+def _add_detail_fetch_columns(cursor):
+    _add_column(cursor, 'games', 'detail_fetched_at', 'datetime null')
+    _add_column(cursor, 'games', 'detail_etag', 'varchar(255) null')
+    _add_column(cursor, 'games', 'detail_last_modified', 'varchar(64) null')
+
+
+def _merge_duplicate_tags(cursor):
+    # the unique tag_name index needs one row per name; keep the lowest tag_id and move the links to it
+    # (names compare case-insensitively, like the column's collation)
+    cursor.execute("SELECT tag_id, tag_name FROM game_tags ORDER BY tag_id")
+    tag_ids_by_name = {}
+    for tag_id, tag_name in cursor.fetchall():
+        tag_ids_by_name.setdefault(tag_name.lower(), []).append(tag_id)
+    for keep_tag_id, *duplicate_tag_ids in (tag_ids for tag_ids in tag_ids_by_name.values() if len(tag_ids) > 1):
+        placeholders = ', '.join(['%s'] * len(duplicate_tag_ids))
+        # links the game already has under the kept tag_id are skipped, then cascade-deleted with the duplicate tag
+        cursor.execute(f"UPDATE IGNORE tags_of_games SET tag_id = %s WHERE tag_id IN ({placeholders})", [keep_tag_id] + duplicate_tag_ids)
+        cursor.execute(f"DELETE FROM game_tags WHERE tag_id IN ({placeholders})", duplicate_tag_ids)
+        print(f"Merged duplicate tags {duplicate_tag_ids} into tag {keep_tag_id}.")
+
+
+def _add_lookup_indexes(cursor):
+    _merge_duplicate_tags(cursor)
+    # game_list_by_tag and every tag id lookup in the ingest job
+    _add_index(cursor, 'game_tags', 'uq_game_tags_tag_name', ['tag_name'], unique=True)
+    # game_detail/<name>; not unique, Steam has distinct games with the same name and a unique key
+    # would turn the ingest upsert of one into an update of the other
+    _add_index(cursor, 'games', 'idx_games_name', ['name'])
+    # game_list and the top 100 diff of the ingest job
+    _add_index(cursor, 'games', 'idx_games_ranking', ['ranking', 'appid'])
+    # games of a tag in appid order; the primary key (appid, tag_id) only serves lookups by game
+    _add_index(cursor, 'tags_of_games', 'idx_tags_of_games_tag_id_appid', ['tag_id', 'appid'])
+
+
+def _create_ingest_runs(cursor):
+    # one row per ingest run (ingest_worker.py), web processes poll it for new data
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_runs
+        (
+            run_id int auto_increment primary key,
+            started_at datetime not null,
+            finished_at datetime null,
+            duration_seconds float null,
+            status varchar(16) not null,
+            mode varchar(16) not null,
+            host varchar(255) null,
+            data_changed tinyint(1) not null default 0,
+            games_refetched int not null default 0,
+            games_unchanged int not null default 0,
+            rankings_changed int not null default 0,
+            games_demoted int not null default 0,
+            tag_links_changed int not null default 0,
+            tag_links_removed int not null default 0,
+            error text null
+        )
+    """)
+    _add_index(cursor, 'ingest_runs', 'idx_ingest_runs_data_changed', ['data_changed', 'run_id'])
+
+
+def _add_last_changed_at(cursor):
+    # when name, ranking or tags last changed, for incremental exports (detail_fetched_at also moves on 304 revalidations)
+    _add_column(cursor, 'games', 'last_changed_at', 'datetime null')
+    # best guess for rows stored before the column existed
+    cursor.execute("UPDATE games SET last_changed_at = detail_fetched_at WHERE last_changed_at IS NULL")
+    _add_index(cursor, 'games', 'idx_games_last_changed_at', ['last_changed_at'])
+
+
+# (version, description, apply) in order; never edit or reorder an applied migration, add a new one
+MIGRATIONS = [
+    (1, 'base tables', _create_base_tables),
+    (2, 'detail fetch state columns on games', _add_detail_fetch_columns),
+    (3, 'indexes for the hot lookups', _add_lookup_indexes),
+    (4, 'ingest run history', _create_ingest_runs),
+    (5, 'last change time on games', _add_last_changed_at),
+]
+
+
+def _applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations
+        (
+            version int not null primary key,
+            description varchar(255) not null,
+            applied_at datetime not null default current_timestamp
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {record[0] for record in cursor.fetchall()}
+
+
+# Example usage:
+# upgrade(connect())
+# [2, 3]
+def upgrade(conn):
+    applied = []
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", [LOCK_NAME, LOCK_TIMEOUT_SECONDS])
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Could not take the {LOCK_NAME} lock within {LOCK_TIMEOUT_SECONDS} sec, is another deploy migrating?")
+        try:
+            applied_versions = _applied_versions(cursor)
+            for version, description, apply in MIGRATIONS:
+                if version in applied_versions:
+                    continue
+                print(f"Applying migration {version}: {description}")
+                apply(cursor)
+                cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)", [version, description])
+                conn.commit()
+                applied.append(version)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", [LOCK_NAME])
+    print(f"Schema up to date at version {MIGRATIONS[-1][0]} ({len(applied)} migrations applied).")
+    return applied
+
+
+# [(version, description, applied), ...]
+def status(conn):
+    with conn.cursor() as cursor:
+        applied_versions = _applied_versions(cursor)
+    return [(version, description, version in applied_versions) for version, description, _ in MIGRATIONS]
+
+
+# The hot read queries with a sample argument and the index each one should use:
+# (name, sql, args, table alias in the EXPLAIN output, index)
+HOT_QUERIES = [
+    ("game_detail by name", sql_builder.game_detail_sql(('name',)), ['Counter-Strike'], 'g', 'idx_games_name'),
+    ("tag id by name", sql_builder.select_one_sql('game_tags', ('tag_id',), ('tag_name',)), ['FPS'], 'game_tags', 'uq_game_tags_tag_name'),
+    ("games by tag (query_game_ids_by_tag)", "SELECT appid FROM tags_of_games WHERE tag_id = %s ORDER BY appid LIMIT %s OFFSET %s", [1, 11, 0],
+     'tags_of_games', 'idx_tags_of_games_tag_id_appid'),
+    ("games by tag count (count_games_by_tag)", "SELECT COUNT(*) FROM tags_of_games WHERE tag_id = %s", [1],
+     'tags_of_games', 'idx_tags_of_games_tag_id_appid'),
+    ("top 100 (query_top_100_game)", "SELECT appid FROM games WHERE ranking <= 100 ORDER BY ranking, appid LIMIT %s OFFSET %s", [101, 0],
+     'games', 'idx_games_ranking'),
+]
+
+
+# EXPLAIN every hot query; returns [(name, ok, chosen key, possible keys, rows)]
+# A query fails only when its index is not even a candidate (missing index or an unindexable predicate).
+# On a small table the optimizer may still prefer a scan, which is reported but not a failure.
+def check(conn):
+    results = []
+    with conn.cursor() as cursor:
+        for name, sql, args, table_alias, index_name in HOT_QUERIES:
+            cursor.execute(f"EXPLAIN {sql}", args)
+            columns = [desc[0] for desc in cursor.description]
+            plan = [dict(zip(columns, record)) for record in cursor.fetchall()]
+            row = next((row for row in plan if row['table'] == table_alias), {})
+            possible_keys = (row.get('possible_keys') or '').split(',')
+            results.append((name, index_name == row.get('key') or index_name in possible_keys, row.get('key'), row.get('possible_keys'), row.get('rows')))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['upgrade', 'status', 'check'])
+    args = parser.parse_args()
+
+    from database.rds_database import connect
+    conn = connect()
+    try:
+        if args.command == 'upgrade':
+            upgrade(conn)
+        elif args.command == 'status':
+            for version, description, applied in status(conn):
+                print(f"{version:>4}  {'applied' if applied else 'pending'}  {description}")
+        else:
+            results = check(conn)
+            for name, ok, key, possible_keys, rows in results:
+                print(f"{'ok  ' if ok else 'FAIL'}  {name}: key={key} possible_keys={possible_keys} rows={rows}")
+            if not all(ok for _, ok, _, _, _ in results):
+                sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def _freeze(value):
+    # turn dict/list arguments into hashable cache key parts
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Bounded LRU cache with a per-entry TTL and a generation counter.
+# Bumping the generation drops every entry at once (used after the ingest job runs).
+# Cached values are shared between requests, so callers must not mutate them.
+#
+# Example usage:
+# cache = query_cache(maxsize=1024, ttl=300)
+# query_data = cache.wrap(cur_database.query_data)
+# query_data('games', columns=['name'])
+# cache.bump_generation()
+class query_cache:
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.generation_updated_at = time.time()
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            # the value was loaded before an invalidation, so it may already be stale
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self.generation
+        value = loader()
+        # read methods return None/[] on errors too, so only non-empty results are cached
+        if value:
+            self.set(key, value, generation)
+        return value
+
+    def wrap(self, read_method):
+        name = read_method.__name__
+        def cached_read(*args, **kwargs):
+            key = (name, _freeze(args), _freeze(kwargs))
+            return self.get_or_load(key, lambda: read_method(*args, **kwargs))
+        cached_read.__name__ = name
+        return cached_read
+
+    # same as wrap, for coroutine read methods (async_rds_database)
+    def wrap_async(self, read_coroutine):
+        name = read_coroutine.__name__
+        async def cached_read(*args, **kwargs):
+            key = (name, _freeze(args), _freeze(kwargs))
+            value = self.get(key)
+            if value is not None:
+                return value
+            generation = self.generation
+            value = await read_coroutine(*args, **kwargs)
+            if value:
+                self.set(key, value, generation)
+            return value
+        cached_read.__name__ = name
+        return cached_read
+
+    def bump_generation(self):
+        with self._lock:
+            self.generation += 1
+            self.generation_updated_at = time.time()
+            self._entries.clear()
+        return self.generation
+
+    def stats(self):
+        with self._lock:
+            return {
+                "generation": self.generation,
+                "generation_updated_at": self.generation_updated_at,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -6,13 +6,21 @@ create table games
 (
     appid int not null primary key,
     name varchar(255) not null,
-    ranking int null
+    ranking int null,
+    detail_fetched_at datetime null,
+    detail_etag varchar(255) null,
+    detail_last_modified varchar(64) null,
+    last_changed_at datetime null,
+    index idx_games_name (name),
+    index idx_games_ranking (ranking, appid),
+    index idx_games_last_changed_at (last_changed_at)
 );
 
 create table game_tags
 (
     tag_id int auto_increment primary key,
-    tag_name varchar(255) not null
+    tag_name varchar(255) not null,
+    unique index uq_game_tags_tag_name (tag_name)
 );
 
 create table tags_of_games
@@ -21,6 +29,7 @@ create table tags_of_games
     appid  int not null,
     weight float null,
     primary key (appid, tag_id),
+    index idx_tags_of_games_tag_id_appid (tag_id, appid),
     constraint game_appid_fk
         foreign key (appid) references games (appid)
             on delete cascade,
@@ -28,11 +37,39 @@ create table tags_of_games
         foreign key (tag_id) references game_tags (tag_id)
             on delete cascade
 );
+
+create table ingest_runs
+(
+    run_id int auto_increment primary key,
+    started_at datetime not null,
+    finished_at datetime null,
+    duration_seconds float null,
+    status varchar(16) not null,
+    mode varchar(16) not null,
+    host varchar(255) null,
+    data_changed tinyint(1) not null default 0,
+    games_refetched int not null default 0,
+    games_unchanged int not null default 0,
+    rankings_changed int not null default 0,
+    games_demoted int not null default 0,
+    tag_links_changed int not null default 0,
+    tag_links_removed int not null default 0,
+    error text null,
+    index idx_ingest_runs_data_changed (data_changed, run_id)
+);
+
+The schema is created and upgraded by database/migrations.py (python -m database.migrations upgrade).
 """
 
+import datetime
+import itertools
 import pymysql
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import os
+from database.connection_pool import connection_pool
+from database import sql_builder
+from util import metrics
 # from util import *
 
 
@@ -43,61 +80,149 @@ PORT = os.getenv("RDS_PORT")
 USER = os.getenv("RDS_USER")  
 PASSWORD = os.getenv("RDS_PASSWORD")  
 DB_NAME = os.getenv("RDS_DB_NAME")  
+POOL_MIN_SIZE = int(os.getenv("RDS_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.getenv("RDS_POOL_MAX_SIZE", 10))
+POOL_TIMEOUT = float(os.getenv("RDS_POOL_TIMEOUT", 5))
+POOL_IDLE_CHECK = float(os.getenv("RDS_POOL_IDLE_CHECK", 30))
+
+
+# counts every statement sent to the database, so N+1 query patterns show up in /metrics
+class instrumented_cursor(pymysql.cursors.Cursor):
+    def execute(self, query, args=None):
+        metrics.record_sql_statement()
+        return super().execute(query, args)
+
+
+# unbuffered variant: rows are read from the socket as they are iterated
+class instrumented_ss_cursor(pymysql.cursors.SSCursor):
+    def execute(self, query, args=None):
+        metrics.record_sql_statement()
+        return super().execute(query, args)
+
+
+def connect():
+    # autocommit so pooled connections never hold a stale read snapshot between requests
+    return pymysql.connect(host=HOST, user=USER, passwd=PASSWORD, db=DB_NAME, port=int(PORT), autocommit=True, cursorclass=instrumented_cursor)
+
 
 class rds_database:
     def __init__(self):
-        self.conn = pymysql.connect(host=HOST, user=USER, passwd=PASSWORD, db=DB_NAME, port=int(PORT))
-        print("AWS RDS Connection established successfully!")
-        self.cursor = self.conn.cursor()
+        self.pool = connection_pool(connect, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT, idle_check_seconds=POOL_IDLE_CHECK)
+        # no connection is opened here, the pool connects on first use (or in pool.prefill)
+        print("AWS RDS Connection pool created successfully!")
 
     def __del__(self):
-        self.conn.close()
-        print("AWS RDS Connection closed successfully!")
+        self.pool.close_all()
+        print("AWS RDS Connection pool closed successfully!")
+
+    # call in every forked worker (e.g. gunicorn post_fork) before the first query
+    def after_fork(self):
+        self.pool.reset_after_fork()
+        print("AWS RDS Connection pool reset after fork!")
     
     # Example usage:
     # self.check_data_exist('users', {'username': 'alice'})
+    @metrics.timed_db_method
     def check_data_exist(self, table_name, conditions):
-        # Construct the SQL statement
-        condition_clauses = ' AND '.join([f"{key} = %s" for key in conditions.keys()])
-        condition_values = list(conditions.values())
-        sql = f"SELECT * FROM {table_name} WHERE {condition_clauses}"
-
-        # check connection
-        self.conn.ping(reconnect=True)
         # Executing the query
         try:
-            self.cursor.execute(sql, condition_values)
-            result = self.cursor.fetchall()
-            if len(result) > 0:
+            # compiled once per (table, condition keys)
+            sql = sql_builder.exists_sql(table_name, tuple(conditions.keys()))
+            condition_values = list(conditions.values())
+            with self.pool.cursor() as cursor:
+                cursor.execute(sql, condition_values)
+                result = cursor.fetchone()
+            if result is not None:
                 return True
             else:
                 return False
         except Exception as e:
             return str(e)
+
+    # Example usage:
+    # self.exists('games', {'appid': 570})
+    # True/False only, errors count as not existing (use check_data_exist to see the error)
+    # not timed itself, check_data_exist already records the call
+    def exists(self, table_name, conditions):
+        return self.check_data_exist(table_name, conditions) is True
+
+    # Example usage:
+    # self.query_one('game_tags', columns=['tag_id'], conditions={'tag_name': 'FPS'})
+    # {'tag_id': 1}, or None when nothing matches; database errors are raised, like query_game_detail
+    @metrics.timed_db_method
+    def query_one(self, table_name, columns=None, conditions=None):
+        sql = sql_builder.select_one_sql(table_name, tuple(columns or ()), tuple((conditions or {}).keys()))
+        with self.pool.cursor() as cursor:
+            cursor.execute(sql, list((conditions or {}).values()) or None)
+            record = cursor.fetchone()
+            if record is None:
+                return None
+            return dict(zip([desc[0] for desc in cursor.description], record))
+
+    # Example usage:
+    # self.query_column('game_tags', 'tag_name')
+    # ['FPS', 'Action', ...]
+    # unbuffered=True streams the rows (SSCursor) instead of buffering the whole result set first
+    # database errors are raised, an empty list means an empty table
+    @metrics.timed_db_method
+    def query_column(self, table_name, column, conditions=None, unbuffered=False):
+        sql = sql_builder.select_sql(table_name, (column,), tuple((conditions or {}).keys()))
+        with self.pool.cursor(instrumented_ss_cursor if unbuffered else None) as cursor:
+            cursor.execute(sql, list((conditions or {}).values()) or None)
+            return [record[0] for record in cursor]
+
+    # Example usage:
+    # for appid, name in self.iter_rows('games', ['appid', 'name']):
+    #     ...
+    # Streams rows as tuples through an unbuffered cursor, so large scans keep memory flat.
+    # The pooled connection is held until the iteration finishes or the generator is closed.
+    def iter_rows(self, table_name, columns=None, conditions=None):
+        sql = sql_builder.select_sql(table_name, tuple(columns or ()), tuple((conditions or {}).keys()))
+        with self.pool.cursor(instrumented_ss_cursor) as cursor:
+            cursor.execute(sql, list((conditions or {}).values()) or None)
+            for record in cursor:
+                yield record
         
+    # Example usage:
+    # for game in self.iter_game_export(since=datetime(2024, 10, 1), tag='FPS', ranked=True):
+    #     ...
+    # {'appid': 730, 'name': '...', 'ranking': 2, 'detail_fetched_at': datetime(...), 'last_changed_at': datetime(...), 'tags': [{'tag_name': 'FPS', 'weight': 9123.0}, ...]}
+    # since filters on last_changed_at, the last time the ingest changed the game's name, ranking or tags
+    # Streams every matching game with its tags through an unbuffered cursor, one game at a time,
+    # so memory stays flat whatever the catalog size. Tags are ordered like query_game_detail,
+    # by weight descending with tag_id breaking ties, so equal weights export in a stable order.
+    def iter_game_export(self, since=None, tag=None, ranked=False):
+        sql = sql_builder.game_export_sql(since is not None, tag is not None, ranked)
+        values = [value for value in (since, tag) if value is not None]
+        with self.pool.cursor(instrumented_ss_cursor) as cursor:
+            cursor.execute(sql, values or None)
+            # rows arrive grouped by appid, one row per tag
+            for appid, rows in itertools.groupby(cursor, key=lambda record: record[0]):
+                rows = list(rows)
+                _, name, ranking, detail_fetched_at, last_changed_at, _, _, _ = rows[0]
+                tag_rows = sorted(
+                    (row[5:] for row in rows if row[6] is not None),
+                    key=lambda tag_row: (tag_row[2] is None, -(tag_row[2] or 0), tag_row[0]),
+                )
+                tags = [{"tag_name": tag_name, "weight": weight} for _, tag_name, weight in tag_rows]
+                yield {"appid": appid, "name": name, "ranking": ranking, "detail_fetched_at": detail_fetched_at, "last_changed_at": last_changed_at, "tags": tags}
+
     # Example usage:
     # self.bulk_insert_data([{'username': 'alice', 'age': 30}, {'username': 'bob', 'age': 25}])
+    @metrics.timed_db_method
     def bulk_insert_data(self,table_name, records):
         if not records:
             return "No records to insert."
 
-        # Extracting column names from the first dictionary (assuming all records are uniform)
-        columns = ', '.join(records[0].keys())
-        placeholders = ', '.join(['%s'] * len(records[0]))
-        # Construct the SQL statement
-        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
         # Preparing the values to insert
         values = [tuple(record.values()) for record in records]
 
-        # check connection
-        self.conn.ping(reconnect=True)
-        # Assuming cursor is a cursor object connected to your database
-        # with connection being a database connection
+        # Executing the insert
         try:
-            cursor = self.cursor
-            cursor.executemany(sql, values)
-            self.conn.commit()
-            # cursor.close()
+            # column names from the first dictionary (assuming all records are uniform)
+            sql = sql_builder.insert_sql(table_name, tuple(records[0].keys()))
+            with self.pool.cursor() as cursor:
+                cursor.executemany(sql, values)
             print(f"Successfully inserted {len(records)} records into {table_name}.")
             return "Success"
         except Exception as e:
@@ -107,32 +232,16 @@ class rds_database:
 
     # Example usage:
     # self.update_data('users', {'age': 31}, {'username': 'alice'})
+    @metrics.timed_db_method
     def update_data(self, table_name ,set_values, conditions):
-    # Preparing SET part of SQL command
-        set_clause = ', '.join([f"{key} = %s" for key in set_values.keys()])
-        set_values_list = list(set_values.values())
-
-        # Preparing WHERE part of SQL command
-        condition_clause = ' AND '.join([f"{key} = %s" for key in conditions.keys()])
-        condition_values_list = list(conditions.values())
-
-        # Complete values list for SQL execution
-        values = set_values_list + condition_values_list
+        # Complete values list for SQL execution, SET values then WHERE values
+        values = list(set_values.values()) + list(conditions.values())
 
-        # Constructing the SQL statement
-        if condition_clause == '':
-            sql = f"UPDATE {table_name} SET {set_clause}"
-        else:
-            sql = f"UPDATE {table_name} SET {set_clause} WHERE {condition_clause}"
-
-        #check connection
-        self.conn.ping(reconnect=True)
         # Executing the update
         try:
-            cursor = self.cursor
-            cursor.execute(sql, values)
-            self.conn.commit()
-            # cursor.close()
+            sql = sql_builder.update_sql(table_name, tuple(set_values.keys()), tuple(conditions.keys()))
+            with self.pool.cursor() as cursor:
+                cursor.execute(sql, values)
             print(f"Successfully updated records in {table_name}.")
             return "Success"
         except Exception as e:
@@ -147,54 +256,313 @@ class rds_database:
     # query all data from a table without conditions
     # all_users = self.query_data('users')
     # print(all_users)
+    @metrics.timed_db_method
     def query_data(self,table_name,columns=None, conditions=None):
-        # Default to selecting all columns if none are specified
-        columns_clause = ', '.join(columns) if columns else '*'
-
-        # Constructing the WHERE clause if conditions are provided
-        if conditions:
-            condition_clauses = ' AND '.join([f"{key} = %s" for key in conditions.keys()])
-            condition_values = list(conditions.values())
-            sql = f"SELECT {columns_clause} FROM {table_name} WHERE {condition_clauses}"
-        else:
-            sql = f"SELECT {columns_clause} FROM {table_name}"
-
-        # check connection
-        self.conn.ping(reconnect=True)
         # Executing the query
         try:
-            cursor = self.cursor
-            if conditions:
-                cursor.execute(sql, condition_values)
-            else:
-                cursor.execute(sql)
+            # all columns if none are specified, WHERE clause only if conditions are provided
+            sql = sql_builder.select_sql(table_name, tuple(columns or ()), tuple((conditions or {}).keys()))
+            with self.pool.cursor() as cursor:
+                if conditions:
+                    cursor.execute(sql, list(conditions.values()))
+                else:
+                    cursor.execute(sql)
 
-            # Fetching all the records
-            records = cursor.fetchall()
-            # cursor.close()
+                # Fetching all the records
+                records = cursor.fetchall()
+                description = cursor.description
 
             # Optionally, return records as a list of dictionaries for better readability
             if records:
-                columns = [desc[0] for desc in cursor.description]
+                columns = [desc[0] for desc in description]
                 return [dict(zip(columns, record)) for record in records]
             return []
         except Exception as e:
             print(f"Error querying data: {e}")
             return []
 
-    def query_top_100_game(self):
+    # Example usage:
+    # self.query_top_100_game()                 -> the whole top 100
+    # self.query_top_100_game(limit=10, offset=20)
+    # self.query_top_100_game(limit=10, after=730) -> the 10 games ranked after appid 730
+    @metrics.timed_db_method
+    def query_top_100_game(self, limit=None, offset=0, after=None):
         # consturct the SQL statement
-        sql = f"SELECT appid FROM games WHERE ranking <= 100 ORDER BY ranking"
+        sql = "SELECT appid FROM games WHERE ranking <= 100"
+        values = []
+        if after is not None:
+            # keyset pagination: continue from the ranking of the last appid seen
+            sql += " AND ranking > (SELECT ranking FROM games WHERE appid = %s)"
+            values.append(after)
+        sql += " ORDER BY ranking, appid"
+        if limit is not None:
+            sql += " LIMIT %s OFFSET %s"
+            values += [limit, 0 if after is not None else offset]
 
-        # check connection
-        self.conn.ping(reconnect=True)
-        # Executing the query
-        try:
-            cursor = self.cursor
-            cursor.execute(sql)
+        # Executing the query (database errors are raised, an empty page must not hide an outage)
+        with self.pool.cursor() as cursor:
+            cursor.execute(sql, values)
             records = cursor.fetchall()
             columns = [desc[0] for desc in cursor.description]
-            return [dict(zip(columns, record)) for record in records]
+        return [dict(zip(columns, record)) for record in records]
+
+    @metrics.timed_db_method
+    def count_top_100_game(self):
+        with self.pool.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM games WHERE ranking <= 100")
+            return cursor.fetchone()[0]
+
+    # Example usage:
+    # self.query_game_ids_by_tag(1, limit=10, offset=20)
+    # self.query_game_ids_by_tag(1, limit=10, after=730) -> the next 10 appids above 730
+    @metrics.timed_db_method
+    def query_game_ids_by_tag(self, tag_id, limit, offset=0, after=None):
+        sql = "SELECT appid FROM tags_of_games WHERE tag_id = %s"
+        values = [tag_id]
+        if after is not None:
+            sql += " AND appid > %s"
+            values.append(after)
+        sql += " ORDER BY appid LIMIT %s OFFSET %s"
+        values += [limit, 0 if after is not None else offset]
+
+        with self.pool.cursor() as cursor:
+            cursor.execute(sql, values)
+            return [record[0] for record in cursor.fetchall()]
+
+    @metrics.timed_db_method
+    def count_games_by_tag(self, tag_id):
+        with self.pool.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM tags_of_games WHERE tag_id = %s", [tag_id])
+            return cursor.fetchone()[0]
+
+    # Example usage:
+    # self.query_game_detail({'appid': 730})
+    # self.query_game_detail({'name': 'Counter-Strike'})
+    # None when no game matches; database errors are raised, so callers can tell an outage from a missing game
+    @metrics.timed_db_method
+    def query_game_detail(self, conditions):
+        # one round trip: the game row repeated once per tag, tags ordered by weight (NULL weights last)
+        sql = sql_builder.game_detail_sql(tuple(conditions.keys()))
+        with self.pool.cursor() as cursor:
+            cursor.execute(sql, list(conditions.values()))
+            records = cursor.fetchall()
+        if not records:
+            return None
+
+        # all rows belong to the first matching game
+        appid, name, ranking, _ = records[0]
+        tags = [record[3] for record in records if record[0] == appid and record[3] is not None]
+        return {"appid": appid, "name": name, "ranking": ranking, "tags": tags}
+
+    # Example usage:
+    # self.query_game_details([570, 730])
+    # {570: {'appid': 570, 'name': 'Dota 2', 'ranking': 1, 'tags': [...]}, 730: {...}}
+    # appids that do not exist are left out; database errors are raised, like query_game_detail
+    @metrics.timed_db_method
+    def query_game_details(self, appids):
+        if not appids:
+            return {}
+        # one round trip for all games, same join and tag order as query_game_detail
+        sql = sql_builder.game_details_sql(len(appids))
+        with self.pool.cursor() as cursor:
+            cursor.execute(sql, list(appids))
+            records = cursor.fetchall()
+
+        game_details = {}
+        for appid, name, ranking, tag_name in records:
+            game_detail = game_details.setdefault(appid, {"appid": appid, "name": name, "ranking": ranking, "tags": []})
+            if tag_name is not None:
+                game_detail['tags'].append(tag_name)
+        return game_details
+
+    # Stored ranking and detail validators of the given games and of every currently ranked game,
+    # for diffing a new top 100 list against the database
+    # {570: {'ranking': 1, 'detail_fetched_at': datetime(...), 'detail_etag': '...', 'detail_last_modified': '...'}, ...}
+    @metrics.timed_db_method
+    def query_ingest_state(self, appids):
+        sql = "SELECT appid, ranking, detail_fetched_at, detail_etag, detail_last_modified FROM games WHERE ranking <= 100"
+        if appids:
+            sql += f" OR appid IN ({', '.join(['%s'] * len(appids))})"
+        try:
+            with self.pool.cursor() as cursor:
+                cursor.execute(sql, list(appids) or None)
+                return {
+                    appid: {"ranking": ranking, "detail_fetched_at": fetched_at, "detail_etag": etag, "detail_last_modified": last_modified}
+                    for appid, ranking, fetched_at, etag, last_modified in cursor.fetchall()
+                }
+        except Exception as e:
+            print(f"Error querying ingest state: {e}")
+            return None
+
+    # Apply the difference between the stored and the new top 100 in one transaction,
+    # so a failed refresh leaves the previous data intact.
+    # games: refetched games [{'appid': 570, 'name': 'Dota 2', 'ranking': 1, 'detail_fetched_at': ..., ...}, ...]
+    # rankings: new rankings of stored games that were not refetched {730: 2, ...}
+    # demoted_appids: games that dropped out of the top 100, their ranking becomes 101
+    # tags_by_game: tags of the refetched games with their vote counts {570: {'Free to Play': 9123, 'MOBA': 4210, ...}, ...},
+    #   only the links that were added, removed or changed weight are written
+    # checked_appids: games whose details were confirmed unchanged (304) at checked_at
+    # last_changed_at is set to checked_at only on games whose name, ranking or tags actually changed
+    # (a refetch can return the same details, a 304 changes nothing)
+    # stats: optional dict, filled with the tag_links_changed / tag_links_removed counts
+    @metrics.timed_db_method
+    def apply_top_100_changes(self, games, rankings, demoted_appids, tags_by_game, checked_appids=(), checked_at=None, stats=None):
+        checked_at = checked_at or datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+        try:
+            with self.pool.connection() as conn:
+                conn.begin()
+                try:
+                    with conn.cursor() as cursor:
+                        if demoted_appids:
+                            cursor.execute(f"UPDATE games SET ranking = 101 WHERE appid IN ({', '.join(['%s'] * len(demoted_appids))})", list(demoted_appids))
+                        if rankings:
+                            cursor.executemany("UPDATE games SET ranking = %s WHERE appid = %s", [(ranking, appid) for appid, ranking in rankings.items()])
+                        if checked_appids:
+                            cursor.execute(f"UPDATE games SET detail_fetched_at = %s WHERE appid IN ({', '.join(['%s'] * len(checked_appids))})", [checked_at] + list(checked_appids))
+                        # compare the refetched games with the stored rows before the upsert overwrites them
+                        changed_games = self._changed_games(cursor, games)
+                        self._upsert(cursor, "games", games, update_columns=['name', 'ranking', 'detail_fetched_at', 'detail_etag', 'detail_last_modified'])
+                        changed_links, removed_links = self._diff_tag_links(cursor, tags_by_game)
+                        if removed_links:
+                            cursor.executemany("DELETE FROM tags_of_games WHERE appid = %s AND tag_id = %s", removed_links)
+                        self._upsert(cursor, "tags_of_games", [{'appid': appid, 'tag_id': tag_id, 'weight': weight} for appid, tag_id, weight in changed_links],
+                                     update_columns=['weight'])
+                        changed_appids = sorted(changed_games | set(rankings) | set(demoted_appids)
+                                                | {link[0] for link in changed_links} | {link[0] for link in removed_links})
+                        if changed_appids:
+                            cursor.execute(f"UPDATE games SET last_changed_at = %s WHERE appid IN ({', '.join(['%s'] * len(changed_appids))})", [checked_at] + changed_appids)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            if stats is not None:
+                stats.update(tag_links_changed=len(changed_links), tag_links_removed=len(removed_links))
+            print(f"Successfully applied top 100 changes: {len(games)} games refetched, {len(rankings)} rankings changed, "
+                  f"{len(demoted_appids)} games demoted, {len(changed_links)} tag links added or reweighted, {len(removed_links)} removed.")
+            return "Success"
         except Exception as e:
-            print(f"Error querying top 100 games: {e}")
-            return []
\ No newline at end of file
+            print(f"Error applying top 100 changes: {e}")
+            return str(e)
+
+    # appids of the given game rows that are new or whose name or ranking differs from the stored row
+    def _changed_games(self, cursor, games):
+        if not games:
+            return set()
+        appids = [game['appid'] for game in games]
+        cursor.execute(f"SELECT appid, name, ranking FROM games WHERE appid IN ({', '.join(['%s'] * len(appids))})", appids)
+        stored_games = {appid: (name, ranking) for appid, name, ranking in cursor.fetchall()}
+        return {game['appid'] for game in games if stored_games.get(game['appid']) != (game['name'], game['ranking'])}
+
+    # (changed, removed) links that turn the stored links of the games in tags_by_game into the given tags:
+    # changed are new or reweighted (appid, tag_id, weight), removed are (appid, tag_id); tags we have never seen are inserted
+    def _diff_tag_links(self, cursor, tags_by_game):
+        if not tags_by_game:
+            return [], []
+        # resolve all tag ids at once (tag_name compares case-insensitively in MySQL, so match on lower case)
+        tag_names = list({tag.lower(): tag for tags in tags_by_game.values() for tag in tags}.values())
+        tag_ids = {name.lower(): tag_id for name, tag_id in self._select_tag_ids(cursor, tag_names).items()}
+        new_tags = [tag for tag in tag_names if tag.lower() not in tag_ids]
+        if new_tags:
+            cursor.executemany("INSERT INTO game_tags (tag_name) VALUES (%s)", new_tags)
+            tag_ids.update({name.lower(): tag_id for name, tag_id in self._select_tag_ids(cursor, new_tags).items()})
+
+        appids = list(tags_by_game)
+        cursor.execute(f"SELECT appid, tag_id, weight FROM tags_of_games WHERE appid IN ({', '.join(['%s'] * len(appids))})", appids)
+        stored_links = {(appid, tag_id): weight for appid, tag_id, weight in cursor.fetchall()}
+        links = {(appid, tag_ids[tag.lower()]): weight for appid, tags in tags_by_game.items() for tag, weight in tags.items()}
+        changed_links = sorted((appid, tag_id, weight) for (appid, tag_id), weight in links.items()
+                               if (appid, tag_id) not in stored_links or stored_links[(appid, tag_id)] != weight)
+        return changed_links, sorted(set(stored_links) - set(links))
+
+    # Cluster-wide lock for the ingest job (MySQL GET_LOCK), yields True when this process holds it.
+    # The lock lives on one pooled connection held for the whole block and is released on exit
+    # (or by the server when that connection dies), so a crashed run never leaves it behind.
+    #
+    # Example usage:
+    # with self.ingest_lock() as locked:
+    #     if locked:
+    #         ...
+    @contextmanager
+    def ingest_lock(self, name='steam_api_ingest'):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0)", [name])
+                locked = cursor.fetchone()[0] == 1
+            try:
+                yield locked
+            finally:
+                if locked:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT RELEASE_LOCK(%s)", [name])
+
+    # Example usage:
+    # self.start_ingest_run('incremental', 'ingest-1')
+    # 42 (the run_id), or None when the run could not be recorded
+    @metrics.timed_db_method
+    def start_ingest_run(self, mode, host):
+        try:
+            with self.pool.cursor() as cursor:
+                cursor.execute(sql_builder.insert_sql('ingest_runs', ('started_at', 'status', 'mode', 'host')), [datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None), 'running', mode, host])
+                return cursor.lastrowid
+        except Exception as e:
+            print(f"Error recording ingest run start: {e}")
+            return None
+
+    # Example usage:
+    # self.finish_ingest_run(42, {'status': 'success', 'duration_seconds': 12.5, 'data_changed': True, 'games_refetched': 3, ...})
+    # finished_at defaults to now when the run dict has none
+    @metrics.timed_db_method
+    def finish_ingest_run(self, run_id, run):
+        if run_id is None:
+            return "No ingest run to finish."
+        values = {column: run[column] for column in sql_builder.SCHEMA['ingest_runs'] if column in run and column not in ('run_id', 'started_at')}
+        values.setdefault('finished_at', datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
+        return self.update_data('ingest_runs', values, {'run_id': run_id})
+
+    # Example usage:
+    # self.query_latest_ingest_run()
+    # {'run_id': 42, 'finished_at': datetime(...)}: the last run that changed the data, None when there is none (or on errors)
+    @metrics.timed_db_method
+    def query_latest_ingest_run(self):
+        try:
+            with self.pool.cursor() as cursor:
+                cursor.execute("SELECT run_id, finished_at FROM ingest_runs WHERE data_changed = 1 ORDER BY run_id DESC LIMIT 1")
+                record = cursor.fetchone()
+            return {"run_id": record[0], "finished_at": record[1]} if record else None
+        except Exception as e:
+            print(f"Error querying the latest ingest run: {e}")
+            return None
+
+    def _upsert(self, cursor, table_name, records, update_columns=None):
+        if not records:
+            return
+        # executemany sends the single-row template as multi-row INSERT statements
+        sql = sql_builder.upsert_sql(table_name, tuple(records[0].keys()), tuple(update_columns or ()))
+        cursor.executemany(sql, [tuple(record.values()) for record in records])
+
+    def _select_tag_ids(self, cursor, tag_names):
+        if not tag_names:
+            return {}
+        placeholders = ', '.join(['%s'] * len(tag_names))
+        cursor.execute(f"SELECT tag_name, tag_id FROM game_tags WHERE tag_name IN ({placeholders})", list(tag_names))
+        return {tag_name: tag_id for tag_name, tag_id in cursor.fetchall()}
+
+    # Example usage:
+    # for appid, ranking, tag_name, weight in self.iter_tag_links():
+    #     ...
+    # Every game with its ranking and tags, one row per (game, tag) in appid order, for building the
+    # in-memory indexes; tag_name and weight are None for games without tags. Streamed through an
+    # unbuffered cursor like iter_rows. Database errors are raised: an empty result would rebuild
+    # the indexes without any game
+    def iter_tag_links(self):
+        sql = (
+            "SELECT g.appid, g.ranking, gt.tag_name, tog.weight "
+            "FROM games g "
+            "LEFT JOIN tags_of_games tog ON tog.appid = g.appid "
+            "LEFT JOIN game_tags gt ON gt.tag_id = tog.tag_id "
+            "ORDER BY g.appid"
+        )
+        with self.pool.cursor(instrumented_ss_cursor) as cursor:
+            cursor.execute(sql)
+            for record in cursor:
+                yield record
@@ -0,0 +1,137 @@
+"""
+Compiled SQL for the dynamic query helpers in rds_database / async_rds_database.
+
+The call shapes are a small fixed set (e.g. games by appid, game_tags by tag_name), so each
+statement is built once per (table, columns, condition keys) and cached. Table and column
+names are checked against SCHEMA when a shape is first compiled, which keeps arbitrary
+identifiers out of the f-string SQL.
+"""
+
+import functools
+
+
+# tables and columns the query helpers may touch
+SCHEMA = {
+    'games': ('appid', 'name', 'ranking', 'detail_fetched_at', 'detail_etag', 'detail_last_modified', 'last_changed_at'),
+    'game_tags': ('tag_id', 'tag_name'),
+    'tags_of_games': ('tag_id', 'appid', 'weight'),
+    'ingest_runs': ('run_id', 'started_at', 'finished_at', 'duration_seconds', 'status', 'mode', 'host', 'data_changed',
+                    'games_refetched', 'games_unchanged', 'rankings_changed', 'games_demoted', 'tag_links_changed',
+                    'tag_links_removed', 'error'),
+}
+
+
+class InvalidIdentifier(ValueError):
+    pass
+
+
+def validate(table_name, columns=()):
+    if table_name not in SCHEMA:
+        raise InvalidIdentifier(f"Unknown table: {table_name!r}")
+    unknown_columns = [column for column in columns if column not in SCHEMA[table_name]]
+    if unknown_columns:
+        raise InvalidIdentifier(f"Unknown columns for {table_name}: {', '.join(map(repr, unknown_columns))}")
+
+
+def _where(condition_keys, prefix=''):
+    return ' AND '.join([f"{prefix}{key} = %s" for key in condition_keys])
+
+
+# Example usage:
+# select_sql('games', ('appid', 'name'), ('appid',))
+# 'SELECT appid, name FROM games WHERE appid = %s'
+@functools.lru_cache(maxsize=256)
+def select_sql(table_name, columns=(), condition_keys=()):
+    validate(table_name, columns + condition_keys)
+    sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}"
+    if condition_keys:
+        sql += f" WHERE {_where(condition_keys)}"
+    return sql
+
+
+@functools.lru_cache(maxsize=256)
+def select_one_sql(table_name, columns=(), condition_keys=()):
+    return f"{select_sql(table_name, columns, condition_keys)} LIMIT 1"
+
+
+# presence check without transferring any row data
+@functools.lru_cache(maxsize=256)
+def exists_sql(table_name, condition_keys):
+    validate(table_name, condition_keys)
+    return f"SELECT 1 FROM {table_name} WHERE {_where(condition_keys)} LIMIT 1"
+
+
+@functools.lru_cache(maxsize=256)
+def insert_sql(table_name, columns):
+    validate(table_name, columns)
+    return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+
+# single-row template; pymysql's executemany folds it into multi-row INSERTs
+@functools.lru_cache(maxsize=256)
+def upsert_sql(table_name, columns, update_columns=()):
+    validate(table_name, columns + update_columns)
+    # without columns to update, a no-op assignment turns duplicates into skips
+    if update_columns:
+        update_clause = ', '.join([f"{column} = VALUES({column})" for column in update_columns])
+    else:
+        update_clause = f"{columns[0]} = {columns[0]}"
+    return f"{insert_sql(table_name, columns)} ON DUPLICATE KEY UPDATE {update_clause}"
+
+
+@functools.lru_cache(maxsize=256)
+def update_sql(table_name, set_keys, condition_keys=()):
+    validate(table_name, set_keys + condition_keys)
+    sql = f"UPDATE {table_name} SET {', '.join([f'{key} = %s' for key in set_keys])}"
+    if condition_keys:
+        sql += f" WHERE {_where(condition_keys)}"
+    return sql
+
+
+# games joined with their tag names, tags ordered by weight (NULL weights last)
+_GAME_DETAIL_SELECT = (
+    "SELECT g.appid, g.name, g.ranking, gt.tag_name "
+    "FROM games g "
+    "LEFT JOIN tags_of_games tog ON tog.appid = g.appid "
+    "LEFT JOIN game_tags gt ON gt.tag_id = tog.tag_id "
+)
+_GAME_DETAIL_ORDER = " ORDER BY g.appid, tog.weight DESC, tog.tag_id"
+
+
+@functools.lru_cache(maxsize=64)
+def game_detail_sql(condition_keys):
+    validate('games', condition_keys)
+    return f"{_GAME_DETAIL_SELECT}WHERE {_where(condition_keys, prefix='g.')}{_GAME_DETAIL_ORDER}"
+
+
+@functools.lru_cache(maxsize=256)
+def game_details_sql(id_count):
+    return f"{_GAME_DETAIL_SELECT}WHERE g.appid IN ({', '.join(['%s'] * id_count)}){_GAME_DETAIL_ORDER}"
+
+
+# every game with its tags for the bulk export, filtered by last change time, tag and/or ranked games;
+# ordered by appid only so MySQL can stream the join in primary key order without a filesort
+@functools.lru_cache(maxsize=16)
+def game_export_sql(since=False, tag=False, ranked=False):
+    conditions = []
+    if since:
+        conditions.append("g.last_changed_at >= %s")
+    if tag:
+        conditions.append(
+            "g.appid IN (SELECT ftog.appid FROM tags_of_games ftog "
+            "JOIN game_tags fgt ON fgt.tag_id = ftog.tag_id WHERE fgt.tag_name = %s)"
+        )
+    if ranked:
+        conditions.append("g.ranking <= 100")
+    return (
+        "SELECT g.appid, g.name, g.ranking, g.detail_fetched_at, g.last_changed_at, tog.tag_id, gt.tag_name, tog.weight "
+        "FROM games g "
+        "LEFT JOIN tags_of_games tog ON tog.appid = g.appid "
+        "LEFT JOIN game_tags gt ON gt.tag_id = tog.tag_id"
+        + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+        + " ORDER BY g.appid"
+    )
+
+
+def cache_info():
+    return {function.__name__: function.cache_info()._asdict() for function in (select_sql, select_one_sql, exists_sql, insert_sql, upsert_sql, update_sql, game_detail_sql, game_details_sql, game_export_sql)}
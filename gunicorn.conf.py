@@ -0,0 +1,53 @@
+# Gunicorn configuration for production
+# gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+import tempfile
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+# create the app once in the master, workers share the code copy-on-write
+# (no database connection is opened there, every worker connects and warms up on its own)
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+accesslog = None  # the app logs requests itself
+# every worker keeps its own metrics, they are written to this directory and /metrics sums them up
+# (set before the app is imported, util.metrics reads it at import time)
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "steam_api_metrics"))
+
+
+def on_starting(server):
+    # counters of the previous server run must not be added to the new ones
+    from util import metrics
+    metrics.clear_multiprocess_dir()
+
+
+def post_fork(server, worker):
+    # database connections opened in the master must not be shared with the workers,
+    # and the log listener thread has to be restarted in the child
+    import app
+    app.after_fork()
+
+
+def post_worker_init(worker):
+    # load this worker's in-memory indexes in the background, /readyz turns 200 when done
+    import app
+    from util import metrics
+    metrics.start_flush_thread()
+    app.start_warmup()
+    # the ingest job runs in ingest_worker.py, workers pick up its data from ingest_runs
+    # (INGEST_IN_WEB=1 schedules it here too, in whichever worker takes the scheduler lock)
+    if app.INGEST_IN_WEB:
+        app.start_scheduler_in_one_process()
+
+
+def child_exit(server, worker):
+    # an exited worker's gauges are dropped, its counters stay in the totals
+    from util import metrics
+    metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,58 @@
+"""
+Standalone ingest worker: runs fetch_steam_api_data outside the web processes.
+
+The ingest lock (MySQL GET_LOCK) lets one run at a time through cluster-wide, so any number of
+workers can be deployed; every run is recorded in ingest_runs, and the web processes load the
+new data when they see a finished run there (INGEST_POLL_SECONDS).
+
+Example:
+    python ingest_worker.py          # run now, then every INGEST_INTERVAL_HOURS (or INGEST_INTERVAL_WEEKS)
+    python ingest_worker.py --once   # a single run, exit status 1 when it failed
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+# This process serves no /metrics: its ingest metrics are written to the directory the gunicorn
+# workers render /metrics from (same default as gunicorn.conf.py, set before the app is imported)
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "steam_api_metrics"))
+
+import app as api
+from util import metrics
+from util.request_logging import stop_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='run the ingest job once and exit')
+    args = parser.parse_args()
+    api.create_app()
+    # a fixed name instead of the pid, so every run (also --once from cron) updates the same series
+    metrics.start_flush_thread(process_name='ingest')
+
+    try:
+        if args.once:
+            run = api.fetch_steam_api_data(refresh_local=False)
+            if run is None:
+                api.app.logger.info("Another ingest run holds the lock, nothing to do")
+            sys.exit(1 if run is not None and run["status"] == "failed" else 0)
+
+        scheduler = BlockingScheduler()
+        # first run right away, then on the interval; a run is skipped while the previous one is still going
+        api.add_ingest_job(scheduler, kwargs={"refresh_local": False}, next_run_time=datetime.datetime.now(), max_instances=1, coalesce=True)
+        api.app.logger.info("Ingest worker started")
+        try:
+            scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+    finally:
+        stop_logging()
+
+
+if __name__ == '__main__':
+    main()
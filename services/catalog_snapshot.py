@@ -0,0 +1,175 @@
+import bisect
+import json
+import sys
+import time
+from array import array
+
+
+class _game_record:
+    __slots__ = ("appid", "name", "ranking", "tags")
+
+    def __init__(self, appid, name, ranking, tags):
+        self.appid = appid
+        self.name = name
+        self.ranking = ranking
+        self.tags = tags
+
+    # a fresh dict per call, so callers can never mutate the shared snapshot
+    def as_dict(self):
+        return {"appid": self.appid, "name": self.name, "ranking": self.ranking, "tags": list(self.tags)}
+
+
+# Immutable snapshot of the whole catalog.
+# top_appids/top_rankings hold the ranked games in (ranking, appid) order, tag_appids holds
+# the games of each tag in appid order, both as int64 arrays so pages are slices found by bisect.
+class _catalog_state:
+    __slots__ = ("games", "games_by_name", "top_appids", "top_rankings", "tag_appids",
+                 "name_list_json", "tag_list_json", "built_at", "nbytes")
+
+    def __init__(self, games, games_by_name, top_appids, top_rankings, tag_appids, name_list_json, tag_list_json, built_at):
+        self.games = games
+        self.games_by_name = games_by_name
+        self.top_appids = top_appids
+        self.top_rankings = top_rankings
+        self.tag_appids = tag_appids
+        self.name_list_json = name_list_json
+        self.tag_list_json = tag_list_json
+        self.built_at = built_at
+        self.nbytes = 0
+
+
+def _json_bytes(value):
+    # same body as Flask's jsonify outside debug mode (compact, ASCII only, trailing newline)
+    return json.dumps(value, separators=(',', ':')).encode() + b'\n'
+
+
+def _footprint(state):
+    # approximate bytes held by the snapshot: containers, records and the strings they reference
+    size = sum(sys.getsizeof(value) for value in (state.games, state.games_by_name, state.tag_appids,
+                                                  state.top_appids, state.top_rankings,
+                                                  state.name_list_json, state.tag_list_json))
+    for game in state.games.values():
+        size += sys.getsizeof(game) + sys.getsizeof(game.name) + sys.getsizeof(game.tags)
+    size += sum(sys.getsizeof(name) for name in state.games_by_name)
+    size += sum(sys.getsizeof(tag_key) + sys.getsizeof(appids) for tag_key, appids in state.tag_appids.items())
+    return size
+
+
+# In-memory copy of the games, game_tags and tags_of_games tables, rebuilt after every ingest.
+# The list endpoints are pre-serialized to JSON bytes, everything else is a dict lookup or an
+# array slice. Tag and game names match case-insensitively, like the MySQL collation.
+#
+# Example usage:
+# catalog = catalog_snapshot()
+# catalog.swap(catalog.build(cur_database.iter_rows('games', ['appid', 'name', 'ranking']),
+#                            cur_database.iter_rows('game_tags', ['tag_id', 'tag_name']),
+#                            cur_database.iter_rows('tags_of_games', ['appid', 'tag_id', 'weight'])))
+# catalog.game(730)
+# catalog.games_by_tag('FPS', limit=10)
+class catalog_snapshot:
+    def __init__(self):
+        self._state = None
+
+    @property
+    def loaded(self):
+        return self._state is not None
+
+    # build and swap are separate so a caller can build several snapshots and serve them together
+    # games: [(appid, name, ranking), ...]
+    # tags: [(tag_id, tag_name), ...]
+    # links: [(appid, tag_id, weight), ...]
+    def build(self, games, tags, links):
+        games = sorted(games)
+        tag_names = dict(tags)
+        links_by_game = {}
+        tag_appid_lists = {tag_id: [] for tag_id in tag_names}
+        for appid, tag_id, weight in links:
+            links_by_game.setdefault(appid, []).append((weight, tag_id))
+            tag_appid_lists.setdefault(tag_id, []).append(appid)
+
+        records = {}
+        games_by_name = {}
+        for appid, name, ranking in games:
+            # same tag order as the detail queries: weight descending with NULL weights last, then tag_id
+            game_links = sorted(links_by_game.get(appid, ()), key=lambda link: (link[0] is None, -(link[0] or 0), link[1]))
+            record = _game_record(appid, name, ranking, tuple(tag_names[tag_id] for _, tag_id in game_links if tag_id in tag_names))
+            records[appid] = record
+            # games are in appid order, so a duplicate name keeps the lowest appid like the SQL lookup
+            games_by_name.setdefault(name.lower(), record)
+
+        ranked = sorted((record.ranking, appid) for appid, record in records.items() if record.ranking is not None and record.ranking <= 100)
+        tag_appids = {}
+        # keep the lowest tag_id per case-insensitive name, like query_one on game_tags
+        for tag_id in sorted(tag_names):
+            tag_appids.setdefault(tag_names[tag_id].lower(), array('q', sorted(tag_appid_lists[tag_id])))
+
+        state = _catalog_state(
+            games=records,
+            games_by_name=games_by_name,
+            top_appids=array('q', [appid for _, appid in ranked]),
+            top_rankings=array('q', [ranking for ranking, _ in ranked]),
+            tag_appids=tag_appids,
+            name_list_json=_json_bytes(sorted(record.name for record in records.values())),
+            tag_list_json=_json_bytes(sorted(tag_names.values())),
+            built_at=time.time(),
+        )
+        state.nbytes = _footprint(state)
+        return state
+
+    def swap(self, state):
+        self._state = state
+        return len(state.games)
+
+    def game(self, appid):
+        record = self._state.games.get(appid)
+        return record.as_dict() if record else None
+
+    def game_by_name(self, name):
+        record = self._state.games_by_name.get(name.lower())
+        return record.as_dict() if record else None
+
+    # {appid: detail} for the appids that exist, like rds_database.query_game_details
+    def game_details(self, appids):
+        games = self._state.games
+        return {appid: games[appid].as_dict() for appid in appids if appid in games}
+
+    # ranked appids ordered by ranking, after=<appid> continues after that game's ranking
+    # returns (appids, total)
+    def top_games(self, limit=None, offset=0, after=None):
+        state = self._state
+        if after is not None:
+            record = state.games.get(after)
+            if record is None or record.ranking is None:
+                return [], len(state.top_appids)
+            offset = bisect.bisect_right(state.top_rankings, record.ranking)
+        end = None if limit is None else offset + limit
+        return state.top_appids[offset:end].tolist(), len(state.top_appids)
+
+    # appids with the tag in appid order, after=<appid> continues after that appid
+    # returns (appids, total), or None when the tag does not exist
+    def games_by_tag(self, tag_name, limit, offset=0, after=None):
+        appids = self._state.tag_appids.get(tag_name.lower())
+        if appids is None:
+            return None
+        if after is not None:
+            offset = bisect.bisect_right(appids, after)
+        return appids[offset:offset + limit].tolist(), len(appids)
+
+    def name_list_json(self):
+        return self._state.name_list_json
+
+    def tag_list_json(self):
+        return self._state.tag_list_json
+
+    def stats(self):
+        state = self._state
+        if state is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "games": len(state.games),
+            "ranked_games": len(state.top_appids),
+            "tags": len(state.tag_appids),
+            "bytes": state.nbytes,
+            "built_at": state.built_at,
+        }
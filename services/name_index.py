@@ -0,0 +1,131 @@
+import bisect
+import heapq
+import re
+import time
+
+
+def _normalize(name):
+    # case-insensitive, punctuation-insensitive: "Counter-Strike: GO" -> "counter strike go"
+    return ' '.join(re.sub(r'[^\w]+', ' ', name.casefold()).split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _name_index_state:
+    __slots__ = ("games", "name_keys", "word_keys", "word_positions", "trigram_positions", "trigram_counts", "built_at")
+
+    def __init__(self, games, name_keys, word_keys, word_positions, trigram_positions, trigram_counts, built_at):
+        self.games = games
+        self.name_keys = name_keys
+        self.word_keys = word_keys
+        self.word_positions = word_positions
+        self.trigram_positions = trigram_positions
+        self.trigram_counts = trigram_counts
+        self.built_at = built_at
+
+
+# In-memory game name index for autocomplete, rebuilt after every ingest.
+# Prefix search matches the start of the name or of any word in it (binary search over sorted keys),
+# fuzzy search ranks names by trigram similarity so typos still match.
+#
+# Example usage:
+# index = name_index()
+# index.swap(index.build([(730, 'Counter-Strike: Global Offensive'), (10, 'Counter-Strike')]))
+# index.search('counter', mode='prefix', limit=10)
+# [(10, 'Counter-Strike'), (730, 'Counter-Strike: Global Offensive')]
+class name_index:
+    MODES = ('prefix', 'fuzzy', 'auto')
+    MIN_SIMILARITY = 0.2
+
+    def __init__(self):
+        self._state = _name_index_state([], [], [], [], {}, [], None)
+
+    # the new index state for rows [(appid, name), ...], left for swap to serve
+    def build(self, rows):
+        games = sorted(((appid, name) for appid, name in rows if name), key=lambda game: (_normalize(game[1]), game[0]))
+        # games are sorted by normalized name, so the position is also the index into name_keys
+        name_keys = [_normalize(name) for _, name in games]
+        word_entries = []
+        trigram_positions = {}
+        trigram_counts = []
+        for position, normalized in enumerate(name_keys):
+            words = normalized.split(' ')
+            # one key per later word start, so "offensive" finds "Counter-Strike: Global Offensive"
+            for word_index in range(1, len(words)):
+                word_entries.append((' '.join(words[word_index:]), position))
+            trigrams = _trigrams(normalized)
+            trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                trigram_positions.setdefault(trigram, []).append(position)
+        word_entries.sort()
+        return _name_index_state(
+            games,
+            name_keys,
+            [entry[0] for entry in word_entries],
+            [entry[1] for entry in word_entries],
+            trigram_positions,
+            trigram_counts,
+            time.time(),
+        )
+
+    def swap(self, state):
+        self._state = state
+        return len(state.games)
+
+    def search(self, query, mode='auto', limit=10):
+        state = self._state
+        normalized = _normalize(query)
+        if not normalized:
+            return []
+        if mode == 'prefix':
+            positions = self._prefix_positions(state, normalized, limit)
+        elif mode == 'fuzzy':
+            positions = self._fuzzy_positions(state, normalized, limit)
+        else:
+            # prefix matches first, topped up with fuzzy matches
+            positions = self._prefix_positions(state, normalized, limit)
+            if len(positions) < limit:
+                seen = set(positions)
+                positions += [position for position in self._fuzzy_positions(state, normalized, limit) if position not in seen][:limit - len(positions)]
+        return [state.games[position] for position in positions]
+
+    def _prefix_positions(self, state, normalized, limit):
+        # names that start with the query rank before names where only a later word does
+        positions = []
+        start = bisect.bisect_left(state.name_keys, normalized)
+        for position in range(start, len(state.name_keys)):
+            if len(positions) >= limit or not state.name_keys[position].startswith(normalized):
+                break
+            positions.append(position)
+
+        seen = set(positions)
+        start = bisect.bisect_left(state.word_keys, normalized)
+        for key_index in range(start, len(state.word_keys)):
+            if len(positions) >= limit or not state.word_keys[key_index].startswith(normalized):
+                break
+            position = state.word_positions[key_index]
+            if position not in seen:
+                seen.add(position)
+                positions.append(position)
+        return positions
+
+    def _fuzzy_positions(self, state, normalized, limit):
+        query_trigrams = _trigrams(normalized)
+        shared = {}
+        for trigram in query_trigrams:
+            for position in state.trigram_positions.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        # Jaccard similarity of the trigram sets
+        scored = []
+        for position, count in shared.items():
+            similarity = count / (len(query_trigrams) + state.trigram_counts[position] - count)
+            if similarity >= self.MIN_SIMILARITY:
+                scored.append((similarity, -position))
+        return [-negative_position for _, negative_position in heapq.nlargest(limit, scored)]
+
+    def stats(self):
+        state = self._state
+        return {"games": len(state.games), "word_keys": len(state.word_keys), "trigrams": len(state.trigram_positions), "built_at": state.built_at}
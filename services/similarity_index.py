@@ -0,0 +1,109 @@
+import time
+from array import array
+
+import numpy as np
+from scipy import sparse
+
+
+class _similarity_index_state:
+    __slots__ = ("appids", "position_of", "vectors", "built_at")
+
+    def __init__(self, appids, position_of, vectors, built_at):
+        self.appids = appids
+        self.position_of = position_of
+        self.vectors = vectors
+        self.built_at = built_at
+
+
+# In-memory "similar games" index, rebuilt after every ingest.
+# Each game is a row of a sparse (CSR) float32 game x tag matrix holding log(1 + votes) per tag,
+# L2-normalized so cosine similarity is a plain dot product. A game has a few dozen tags out of
+# hundreds, so only the links are stored, and games are never deleted (demoted ones stay), which
+# would make a dense matrix grow with the whole catalog in every worker. The score product only
+# holds the games sharing a tag with the query game, argpartition picks the top k among those.
+#
+# Example usage:
+# index = similarity_index()
+# index.swap(index.build(cur_database.iter_tag_links()))
+# index.similar([730], limit=5)
+# {730: [(10, 0.93), (240, 0.91), ...]}
+class similarity_index:
+    def __init__(self):
+        self._state = _similarity_index_state(np.empty(0, dtype=np.int64), {}, sparse.csr_matrix((0, 0), dtype=np.float32), None)
+
+    # normalized game x tag matrix for rows, read in one pass; nothing is served until swap
+    # rows: (appid, ranking, tag_name, weight) as streamed by rds_database.iter_tag_links
+    def build(self, rows):
+        position_of = {}
+        tag_position_of = {}
+        # one entry per tag link, kept in typed arrays instead of a list of row tuples
+        game_positions = array('i')
+        tag_positions = array('i')
+        weights = array('f')
+        for appid, _, tag_name, weight in rows:
+            position = position_of.setdefault(appid, len(position_of))
+            if tag_name is None:
+                continue
+            game_positions.append(position)
+            tag_positions.append(tag_position_of.setdefault(tag_name.lower(), len(tag_position_of)))
+            # links stored before weights were recorded count as one vote
+            weights.append(weight if weight is not None else 1.0)
+
+        # vote counts span several orders of magnitude, log damps the top tags
+        values = np.log1p(np.frombuffer(weights, dtype=np.float32))
+        vectors = sparse.csr_matrix(
+            (values, (np.frombuffer(game_positions, dtype=np.int32), np.frombuffer(tag_positions, dtype=np.int32))),
+            shape=(len(position_of), len(tag_position_of)), dtype=np.float32,
+        )
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+        # games without tags have an empty row and so no similar games
+        inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        vectors.data *= np.repeat(inverse_norms, np.diff(vectors.indptr)).astype(np.float32)
+        return _similarity_index_state(np.fromiter(position_of, dtype=np.int64, count=len(position_of)), position_of, vectors, time.time())
+
+    def swap(self, state):
+        self._state = state
+        return len(state.appids)
+
+    # Top `limit` most similar games for each of the given appids, in one batched sparse product.
+    # Returns {appid: [(similar appid, score), ...]} best first; unknown appids are left out.
+    def similar(self, appids, limit=10, min_score=0.0):
+        state = self._state
+        known_appids = [appid for appid in appids if appid in state.position_of]
+        if not known_appids:
+            return {}
+
+        positions = [state.position_of[appid] for appid in known_appids]
+        # (query games, all games), a row only stores the games sharing a tag with its query game
+        scores = (state.vectors[positions] @ state.vectors.T).tocsr()
+        scores.sort_indices()
+
+        results = {}
+        for row, (appid, position) in enumerate(zip(known_appids, positions)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            candidates = scores.indices[start:end]
+            candidate_scores = scores.data[start:end]
+            # a game is not similar to itself
+            keep = (candidates != position) & (candidate_scores > min_score)
+            candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+            if limit < len(candidates):
+                top = np.argpartition(-candidate_scores, limit - 1)[:limit]
+                candidates, candidate_scores = candidates[top], candidate_scores[top]
+            # argpartition leaves the top k unordered, sort just those
+            order = np.argsort(-candidate_scores, kind='stable')
+            results[appid] = [
+                (int(state.appids[candidate]), round(float(score), 4))
+                for candidate, score in zip(candidates[order], candidate_scores[order])
+            ]
+        return results
+
+    def stats(self):
+        state = self._state
+        vectors = state.vectors
+        return {
+            "games": int(vectors.shape[0]),
+            "tags": int(vectors.shape[1]),
+            "links": int(vectors.nnz),
+            "bytes": int(vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes),
+            "built_at": state.built_at,
+        }
@@ -0,0 +1,66 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+logger = logging.getLogger(__name__)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+# Shared HTTP session: keep-alive connections sized to the concurrency cap,
+# retries with exponential backoff on 429/5xx (honouring Retry-After).
+#
+# Example usage:
+# session = create_session(concurrency=8)
+# session.get(STEAM_TOP_100_API, timeout=10)
+def create_session(concurrency=8, retries=3, backoff_factor=0.5):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Fetch game details for every appid with at most `concurrency` requests in flight, for the ingest job.
+# validators: {appid: (etag, last_modified)} saved from the previous fetch, sent as If-None-Match /
+# If-Modified-Since so an unchanged game comes back as a bodyless 304.
+# Results are (status_code, game_detail, etag, last_modified) tuples in the same order as `appids`,
+# whatever order the responses arrive in; status_code is None when the request itself failed.
+#
+# Example usage:
+# fetch_changed_game_details(session, STEAM_GAME_DETAIL_API, [570, 730], validators={570: ('W/"abc"', None)})
+# [(304, None, 'W/"abc"', None), (200, {'appid': 730, ...}, 'W/"def"', 'Tue, 15 Oct 2024 08:00:00 GMT')]
+def fetch_changed_game_details(session, detail_api, appids, validators=None, concurrency=8, timeout=10):
+    validators = validators or {}
+
+    def fetch_one(appid):
+        etag, last_modified = validators.get(appid, (None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            response = session.get(detail_api + str(appid), headers=headers, timeout=timeout)
+            if response.status_code == 304:
+                return 304, None, etag, last_modified
+            if response.status_code != 200:
+                return response.status_code, None, None, None
+            return 200, response.json(), response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except Exception as e:
+            logger.error(f"Failed to fetch game detail for appid {appid}: {e}")
+            return None, None, None, None
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(fetch_one, appids))
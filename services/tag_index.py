@@ -0,0 +1,97 @@
+import time
+
+
+# Immutable snapshot of the tag -> games inverted index.
+# Games are numbered by position in the sorted appid array, and each tag maps to an int bitset
+# over those positions, so AND/OR/NOT across tags are single big-int operations.
+class _tag_index_state:
+    __slots__ = ("appids", "rankings", "tag_bits", "tag_weights", "all_bits", "built_at")
+
+    def __init__(self, appids, rankings, tag_bits, tag_weights, built_at):
+        self.appids = appids
+        self.rankings = rankings
+        self.tag_bits = tag_bits
+        self.tag_weights = tag_weights
+        self.all_bits = (1 << len(appids)) - 1
+        self.built_at = built_at
+
+
+def _positions(bits):
+    # positions of the set bits, lowest first
+    binary = bin(bits)[:1:-1]
+    position = binary.find('1')
+    while position != -1:
+        yield position
+        position = binary.find('1', position + 1)
+
+
+# In-memory inverted index from tag name to games, rebuilt after every ingest.
+# Tag names match case-insensitively, like the game_tags table.
+#
+# Example usage:
+# index = tag_index()
+# index.swap(index.build(cur_database.iter_tag_links()))
+# index.query(['FPS', 'Co-op'], exclude=['Survival'], order_by='ranking', limit=10)
+class tag_index:
+    ORDER_BY = ('ranking', 'weight', 'appid')
+
+    def __init__(self):
+        self._state = _tag_index_state([], [], {}, {}, None)
+
+    # new snapshot for rows, served only once it is passed to swap
+    # rows: (appid, ranking, tag_name, weight) as streamed by rds_database.iter_tag_links
+    def build(self, rows):
+        # two passes, the appids are numbered in sorted order first
+        rows = list(rows)
+        appids = sorted({row[0] for row in rows})
+        position_of = {appid: position for position, appid in enumerate(appids)}
+        rankings = [None] * len(appids)
+        tag_bits = {}
+        tag_weights = {}
+        for appid, ranking, tag_name, weight in rows:
+            position = position_of[appid]
+            rankings[position] = ranking
+            if tag_name is None:
+                continue
+            tag_key = tag_name.lower()
+            tag_bits[tag_key] = tag_bits.get(tag_key, 0) | (1 << position)
+            if weight is not None:
+                tag_weights.setdefault(tag_key, {})[position] = weight
+        return _tag_index_state(appids, rankings, tag_bits, tag_weights, time.time())
+
+    def swap(self, state):
+        self._state = state
+        return len(state.appids)
+
+    def query(self, tags, exclude=(), match='all', order_by='ranking', limit=None):
+        state = self._state
+        tag_keys = [tag.lower() for tag in tags]
+        if match == 'any':
+            bits = 0
+            for tag_key in tag_keys:
+                bits |= state.tag_bits.get(tag_key, 0)
+        else:
+            bits = state.all_bits
+            for tag_key in tag_keys:
+                bits &= state.tag_bits.get(tag_key, 0)
+        for tag_key in exclude:
+            bits &= ~state.tag_bits.get(tag_key.lower(), 0)
+
+        positions = list(_positions(bits))
+        if order_by == 'weight':
+            # total weight of the requested tags, heaviest first
+            weights = [state.tag_weights.get(tag_key, {}) for tag_key in tag_keys]
+            positions.sort(key=lambda position: (-sum(weight.get(position, 0) for weight in weights), state.appids[position]))
+        elif order_by == 'ranking':
+            # ranked games first, unranked games (NULL ranking) last
+            positions.sort(key=lambda position: (state.rankings[position] is None, state.rankings[position] or 0, state.appids[position]))
+        # order_by == 'appid' is already the position order
+
+        total = len(positions)
+        if limit is not None:
+            positions = positions[:limit]
+        return [state.appids[position] for position in positions], total
+
+    def stats(self):
+        state = self._state
+        return {"games": len(state.appids), "tags": len(state.tag_bits), "built_at": state.built_at}
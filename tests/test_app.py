@@ -0,0 +1,218 @@
+import datetime
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+
+import app as api
+
+
+@pytest.fixture(scope='module')
+def flask_app():
+    return api.create_app()
+
+
+@pytest.fixture
+def client(flask_app, monkeypatch):
+    # warmup is left out, the tests set the state it would load
+    monkeypatch.setattr(api, '_warmup_pid', api.os.getpid())
+    monkeypatch.setattr(api, '_loaded_ingest_run', {"run_id": 7, "finished_at": datetime.datetime(2024, 10, 15, 8, 0)})
+    return flask_app.test_client()
+
+
+def fake_export(games, error=None):
+    def iter_game_export(since=None, tag=None, ranked=False):
+        for game in games:
+            yield game
+        if error is not None:
+            raise error
+    return iter_game_export
+
+
+def test_export_streams_every_game(client, monkeypatch):
+    games = [
+        {"appid": 10, "name": "Counter-Strike", "ranking": 46, "detail_fetched_at": datetime.datetime(2024, 10, 15, 8, 0), "last_changed_at": None, "tags": [{"tag_name": "FPS", "weight": 5.0}]},
+        {"appid": 730, "name": "Counter-Strike 2", "ranking": 2, "detail_fetched_at": None, "last_changed_at": None, "tags": []},
+    ]
+    monkeypatch.setattr(api.cur_database, 'iter_game_export', fake_export(games))
+    response = client.get('/steam_api/export')
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["appid"] for line in lines] == [10, 730]
+    assert lines[0]["detail_fetched_at"] == "2024-10-15T08:00:00"
+
+    response = client.get('/steam_api/export?format=csv')
+    assert response.get_data(as_text=True).splitlines()[1] == '10,Counter-Strike,46,2024-10-15T08:00:00,FPS,'
+
+
+def test_export_answers_500_when_the_database_is_unreachable(client, monkeypatch):
+    monkeypatch.setattr(api.cur_database, 'iter_game_export', fake_export([], error=ConnectionRefusedError(111, "Connection refused")))
+    response = client.get('/steam_api/export')
+    assert response.status_code == 500
+    assert response.headers.get('Cache-Control') != f"public, max-age={api.HTTP_CACHE_MAX_AGE}"
+
+
+def test_export_is_never_cached_by_the_ingest_run(client, monkeypatch):
+    monkeypatch.setattr(api.cur_database, 'iter_game_export', fake_export([]))
+    response = client.get('/steam_api/export')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert 'Cache-Control' not in response.headers
+
+
+class unreachable_pool:
+    def cursor(self, cursor_class=None):
+        raise ConnectionRefusedError(111, "Connection refused")
+
+
+@pytest.fixture
+def database_down(monkeypatch):
+    # catalog reads go to the database, which cannot be reached
+    monkeypatch.setattr(api.catalog, '_state', None)
+    monkeypatch.setattr(api.cur_database, 'pool', unreachable_pool())
+    api.read_cache.bump_generation()
+
+
+@pytest.mark.parametrize('path', ['/steam_api/game_list', '/steam_api/game_list_by_tag/FPS', '/steam_api/game_name_list', '/steam_api/game_tag_list'])
+def test_database_outage_is_500_not_missing_data(client, database_down, path):
+    response = client.get(path)
+    assert response.status_code == 500
+    assert 'ETag' not in response.headers
+
+
+def test_scheduler_runs_only_in_the_process_holding_the_lock(tmp_path, monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+    started = threading.Event()
+    monkeypatch.setattr(api, 'SCHEDULER_LOCK_FILE', str(tmp_path / 'scheduler.lock'))
+    monkeypatch.setattr(api, 'start_scheduler', started.set)
+    # another worker holds the lock
+    with open(api.SCHEDULER_LOCK_FILE, 'w') as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX)
+        api.start_scheduler_in_one_process()
+        assert not started.wait(0.1)
+    # and exits, this one takes over
+    assert started.wait(2)
+
+
+@pytest.fixture
+def warmed_up(monkeypatch):
+    monkeypatch.setitem(api.warmup_status, "ready", True)
+
+
+@pytest.mark.parametrize('path', ['/steam_api/similar/730?limit=ten', '/steam_api/similar?ids=730&limit=ten', '/steam_api/similar?ids=730,x'])
+def test_similar_routes_reject_invalid_parameters(client, warmed_up, path):
+    response = client.get(path)
+    assert response.status_code == 400
+
+
+def test_game_details_rejects_a_string_of_ids(client):
+    response = client.post('/steam_api/game_details', json={"ids": "570"})
+    assert response.status_code == 400
+    assert response.get_json() == {"message": "ids must be a list of integers"}
+
+
+class fake_response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class fake_session:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, timeout=None):
+        return self.response
+
+
+@pytest.fixture
+def ingest(flask_app, monkeypatch):
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+    stored_games = {
+        # stale, revalidated with its validators
+        730: {"ranking": 1, "detail_fetched_at": now - datetime.timedelta(days=30), "detail_etag": '"cs2"', "detail_last_modified": None},
+        # fresh, not fetched
+        440: {"ranking": 3, "detail_fetched_at": now, "detail_etag": None, "detail_last_modified": None},
+        # dropped out of the top 100
+        10: {"ranking": 50, "detail_fetched_at": now, "detail_etag": None, "detail_last_modified": None},
+    }
+    calls = {"stored": stored_games}
+
+    def fetch_changed_game_details(session, url, appids, validators=None, concurrency=None, timeout=None):
+        calls["fetched"] = (list(appids), validators)
+        return [calls["details"].get(appid, (500, None, None, None)) for appid in appids]
+
+    def apply_top_100_changes(games, rankings, demoted_appids, tags_by_game, checked_appids=(), checked_at=None, stats=None):
+        calls["applied"] = (games, rankings, demoted_appids, tags_by_game, list(checked_appids))
+        return "Success"
+
+    monkeypatch.setattr(api, 'INGEST_MODE', 'incremental')
+    monkeypatch.setattr(api, 'fetch_changed_game_details', fetch_changed_game_details)
+    monkeypatch.setattr(api.cur_database, 'query_ingest_state', lambda appids: stored_games)
+    monkeypatch.setattr(api.cur_database, 'apply_top_100_changes', apply_top_100_changes)
+    return calls
+
+
+def test_ingest_fetches_only_new_and_stale_games(ingest):
+    ingest["details"] = {570: (200, {"name": "Dota 2", "tags": {"MOBA": 4210}}, '"dota"', None), 730: (304, None, None, None)}
+    run = {}
+    api.ingest_top_100_games(fake_session(fake_response(200, ["570", "730", "440"])), run)
+    assert ingest["fetched"] == ([570, 730], {730: ('"cs2"', None)})
+    games, rankings, demoted_appids, tags_by_game, checked_appids = ingest["applied"]
+    assert [(game["appid"], game["name"], game["ranking"], game["detail_etag"]) for game in games] == [(570, "Dota 2", 1, '"dota"')]
+    assert rankings == {730: 2}
+    assert demoted_appids == [10]
+    assert tags_by_game == {570: {"MOBA": 4210}}
+    assert checked_appids == [730]
+    assert run["status"] == "success" and run["data_changed"]
+    assert (run["games_refetched"], run["games_unchanged"], run["rankings_changed"], run["games_demoted"]) == (1, 1, 1, 1)
+
+
+def test_ingest_without_changes_keeps_the_data(ingest):
+    ingest["details"] = {730: (304, None, None, None)}
+    del ingest["stored"][10]
+    # appid 2 is new but its detail request fails, so nothing is stored for it
+    run = {}
+    api.ingest_top_100_games(fake_session(fake_response(200, ["730", "2", "440"])), run)
+    assert ingest["applied"] == ([], {}, [], {}, [730])
+    assert run["status"] == "unchanged" and not run["data_changed"]
+
+
+def test_failed_top_100_request_stores_nothing(ingest):
+    run = {}
+    api.ingest_top_100_games(fake_session(fake_response(503)), run)
+    assert "fetched" not in ingest and "applied" not in ingest
+    assert run["status"] == "failed" and not run["data_changed"]
+
+
+def test_page_links_carry_the_expansion_arguments(flask_app):
+    with flask_app.test_request_context('/steam_api/game_list?page=2&per_page=10&fields=name'):
+        assert api.pagination_link_args(2, 10, None) == {"page": 2, "per_page": 10, "fields": "name"}
+        assert api.next_page_link_args(2, 10, None, [570, 730]) == {"page": 3, "per_page": 10, "fields": "name"}
+        assert api.prev_page_link_args(2, 10) == {"page": 1, "per_page": 10, "fields": "name"}
+
+
+def test_keyset_page_links_continue_after_the_last_game(flask_app):
+    with flask_app.test_request_context('/steam_api/game_list_by_tag/FPS?after=10&per_page=2&expand=detail'):
+        assert api.pagination_link_args(1, 2, 10) == {"after": 10, "per_page": 2, "expand": "detail"}
+        assert api.next_page_link_args(1, 2, 10, [240, 730]) == {"after": 730, "per_page": 2, "expand": "detail"}
+
+
+def test_get_batch_ids_reads_the_query_or_the_json_body(flask_app, monkeypatch):
+    monkeypatch.setattr(api, 'GAME_DETAILS_MAX_IDS', 2)
+    with flask_app.test_request_context('/steam_api/game_details?ids=730,570,730'):
+        assert api.get_batch_ids() == [730, 570]
+    with flask_app.test_request_context('/steam_api/game_details', method='POST', json={"ids": [570, 10]}):
+        assert api.get_batch_ids() == [570, 10]
+    with flask_app.test_request_context('/steam_api/game_details?ids=1,2,3'):
+        with pytest.raises(ValueError, match="At most 2 ids per request"):
+            api.get_batch_ids()
+    # a body that is not JSON is the same as no ids
+    with flask_app.test_request_context('/steam_api/game_details', method='POST', data='570', content_type='text/plain'):
+        with pytest.raises(ValueError, match="No ids given"):
+            api.get_batch_ids()
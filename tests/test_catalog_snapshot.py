@@ -0,0 +1,64 @@
+import json
+
+from services.catalog_snapshot import catalog_snapshot
+
+
+GAMES = [(730, 'Counter-Strike: Global Offensive', 2), (10, 'Counter-Strike', 46), (240, 'Counter-Strike: Source', 101), (570, 'Dota 2', 1)]
+TAGS = [(1, 'FPS'), (2, 'MOBA'), (3, 'fps'), (4, 'Unused')]
+LINKS = [(730, 1, 100.0), (10, 1, 50.0), (240, 1, None), (730, 3, 500.0), (570, 2, 9000.0), (10, 2, None)]
+
+
+def build_catalog():
+    catalog = catalog_snapshot()
+    assert not catalog.loaded
+    assert catalog.swap(catalog.build(GAMES, TAGS, LINKS)) == 4
+    return catalog
+
+
+def test_game_lookups():
+    catalog = build_catalog()
+    assert catalog.loaded
+    # tags by weight descending, NULL weights last
+    assert catalog.game(730) == {"appid": 730, "name": "Counter-Strike: Global Offensive", "ranking": 2, "tags": ['fps', 'FPS']}
+    assert catalog.game(10)['tags'] == ['FPS', 'MOBA']
+    assert catalog.game(1) is None
+    assert catalog.game_by_name('dota 2')['appid'] == 570
+    assert catalog.game_details([570, 1, 10]).keys() == {570, 10}
+
+
+def test_returned_dicts_are_copies():
+    catalog = build_catalog()
+    catalog.game(10)['tags'].append('Changed')
+    assert catalog.game(10)['tags'] == ['FPS', 'MOBA']
+
+
+def test_top_games_pages():
+    catalog = build_catalog()
+    assert catalog.top_games() == ([570, 730, 10], 3)
+    assert catalog.top_games(limit=1, offset=1) == ([730], 3)
+    assert catalog.top_games(limit=5, after=730) == ([10], 3)
+    assert catalog.top_games(limit=5, after=240) == ([], 3)
+
+
+def test_games_by_tag_pages():
+    catalog = build_catalog()
+    # a case-insensitive duplicate keeps the lowest tag_id, like the SQL lookup
+    assert catalog.games_by_tag('fps', limit=10) == ([10, 240, 730], 3)
+    assert catalog.games_by_tag('FPS', limit=1, after=10) == ([240], 3)
+    assert catalog.games_by_tag('Unused', limit=10) == ([], 0)
+    assert catalog.games_by_tag('Racing', limit=10) is None
+
+
+def test_pre_serialized_lists():
+    catalog = build_catalog()
+    assert json.loads(catalog.name_list_json()) == sorted(name for _, name, _ in GAMES)
+    assert json.loads(catalog.tag_list_json()) == sorted(name for _, name in TAGS)
+
+
+def test_build_does_not_serve_until_swap():
+    catalog = build_catalog()
+    state = catalog.build([(1, 'New', 1)], [], [])
+    assert catalog.game(1) is None
+    catalog.swap(state)
+    assert catalog.game(1)['name'] == 'New'
+    assert catalog.stats()['games'] == 1
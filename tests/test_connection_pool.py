@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pymysql")
+
+import pymysql
+
+from database.connection_pool import PoolTimeout, connection_pool
+
+
+class fake_connection:
+    def __init__(self):
+        self.closed = False
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def close(self):
+        self.closed = True
+
+    def cursor(self, cursor_class=None):
+        return fake_cursor()
+
+
+class fake_cursor:
+    def close(self):
+        pass
+
+
+def counting_connect(connections):
+    def connect():
+        conn = fake_connection()
+        connections.append(conn)
+        return conn
+    return connect
+
+
+def test_connects_lazily_and_prefills_to_min_size():
+    connections = []
+    pool = connection_pool(counting_connect(connections), min_size=2, max_size=4)
+    assert connections == []
+    pool.prefill()
+    assert len(connections) == 2
+    assert pool.stats() == {"size": 2, "idle": 2, "in_use": 0, "max_size": 4}
+
+
+def test_acquire_times_out_when_the_pool_is_exhausted():
+    pool = connection_pool(counting_connect([]), min_size=0, max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.05
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_waiting_acquire_gets_a_released_connection():
+    pool = connection_pool(counting_connect([]), min_size=0, max_size=1, timeout=2)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, [conn]).start()
+    assert pool.acquire() is conn
+
+
+def test_failed_connect_frees_its_slot():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise pymysql.err.OperationalError(2003, "Can't connect")
+        return fake_connection()
+
+    pool = connection_pool(connect, min_size=1, max_size=1, timeout=0.05)
+    with pytest.raises(pymysql.err.OperationalError):
+        pool.prefill()
+    assert pool.stats()["size"] == 0
+    pool.prefill()
+    assert pool.stats()["size"] == 1
+
+
+def test_broken_connections_are_closed_and_replaced():
+    connections = []
+    pool = connection_pool(counting_connect(connections), min_size=0, max_size=1)
+    with pytest.raises(pymysql.err.OperationalError):
+        with pool.cursor():
+            raise pymysql.err.OperationalError(2013, "Lost connection")
+    assert connections[0].closed
+    assert pool.stats()["size"] == 0
+    with pool.cursor():
+        pass
+    assert len(connections) == 2
+
+
+def test_only_idle_connections_are_pinged():
+    connections = []
+    pool = connection_pool(counting_connect(connections), min_size=0, max_size=1, idle_check_seconds=0.02)
+    pool.release(pool.acquire())
+    pool.release(pool.acquire())
+    assert connections[0].pings == 0
+    time.sleep(0.03)
+    pool.release(pool.acquire())
+    assert connections[0].pings == 1
@@ -0,0 +1,78 @@
+import gzip
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from util.http_cache import http_cache
+
+
+BODY = "x" * 4096
+
+
+@pytest.fixture
+def served():
+    app = flask.Flask(__name__)
+    state = {"version": ("ingest-run-7", 1729150000), "calls": 0}
+
+    @app.route('/steam_api/game_list')
+    def game_list():
+        state["calls"] += 1
+        return BODY
+
+    @app.route('/steam_api/small')
+    def small():
+        return "ok"
+
+    state["cache"] = http_cache(app, version=lambda: state["version"], max_age=60, min_compress_size=1024)
+    state["client"] = app.test_client()
+    return state
+
+
+def test_matching_etag_is_answered_before_the_route_runs(served):
+    client = served["client"]
+    response = client.get('/steam_api/game_list')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == "public, max-age=60"
+    assert response.headers['Last-Modified'] == "Thu, 17 Oct 2024 07:26:40 GMT"
+
+    response = client.get('/steam_api/game_list', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert served["calls"] == 1
+
+    # a new ingest run changes the ETag
+    served["version"] = ("ingest-run-8", 1729160000)
+    assert client.get('/steam_api/game_list', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_if_modified_since(served):
+    client = served["client"]
+    assert client.get('/steam_api/game_list', headers={'If-Modified-Since': "Thu, 17 Oct 2024 07:26:40 GMT"}).status_code == 304
+    assert client.get('/steam_api/game_list', headers={'If-Modified-Since': "Thu, 17 Oct 2024 07:26:39 GMT"}).status_code == 200
+    # If-None-Match takes precedence
+    assert client.get('/steam_api/game_list', headers={'If-None-Match': 'W/"other"', 'If-Modified-Since': "Thu, 17 Oct 2024 07:26:40 GMT"}).status_code == 200
+
+
+def test_unknown_version_is_not_stored(served):
+    served["version"] = None
+    response = served["client"].get('/steam_api/game_list', headers={'If-None-Match': '*'})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert 'ETag' not in response.headers
+
+
+def test_large_responses_are_compressed_once_per_etag(served):
+    client = served["client"]
+    response = client.get('/steam_api/game_list', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()).decode() == BODY
+    assert served["cache"].stats()["compressed_entries"] == 1
+
+    client.get('/steam_api/game_list', headers={'Accept-Encoding': 'gzip'})
+    assert served["cache"].stats()["compressed_entries"] == 1
+
+    # small bodies and clients without gzip are left alone
+    assert 'Content-Encoding' not in client.get('/steam_api/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/steam_api/game_list', headers={'Accept-Encoding': 'identity'}).headers
@@ -0,0 +1,84 @@
+import re
+
+from util import metrics
+
+
+# a sample line of the Prometheus text format: name, optional labels, a number
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{.*\})? (-?[0-9.e+-]+|[+-]Inf|NaN)$')
+
+
+def assert_parseable(text):
+    for line in text.splitlines():
+        assert line.startswith('#') or SAMPLE_LINE.match(line), line
+
+
+def test_collector_booleans_and_none_render_as_numbers(monkeypatch):
+    monkeypatch.setattr(metrics, 'MULTIPROC_DIR', None)
+    registry = metrics.metrics_registry()
+    registry.add_collector('test_snapshot', 'Snapshot state', 'gauge', ['stat'], lambda: {('loaded',): False, ('built_at',): None, ('games',): 3})
+    text = registry.render()
+    assert_parseable(text)
+    assert 'test_snapshot{stat="loaded"} 0' in text
+    assert 'test_snapshot{stat="built_at"} NaN' in text
+
+
+def test_collector_with_a_non_number_is_left_out(monkeypatch):
+    monkeypatch.setattr(metrics, 'MULTIPROC_DIR', None)
+    registry = metrics.metrics_registry()
+    registry.add_collector('test_broken', 'Broken collector', 'gauge', ['stat'], lambda: {('state',): 'ready'})
+    registry.add_collector('test_pool', 'Pool state', 'gauge', ['state'], lambda: {('idle',): 2})
+    text = registry.render()
+    assert_parseable(text)
+    assert 'test_broken' not in text
+    assert 'test_pool{state="idle"} 2' in text
+
+
+def test_ingest_worker_metrics_show_up_in_the_web_process_render(tmp_path):
+    ingest_registry = metrics.metrics_registry()
+    ingest_registry.histogram('test_ingest_duration_seconds', 'Ingest duration', buckets=(10, 60)).observe(12.5)
+    ingest_registry.gauge('test_ingest_last_run_timestamp_seconds', 'Last run').set(1729150000)
+    ingest_registry.flush(str(tmp_path), process_name='ingest')
+    # a later run of the worker replaces the file instead of adding a series
+    ingest_registry.flush(str(tmp_path), process_name='ingest')
+
+    web_registry = metrics.metrics_registry()
+    web_registry.counter('test_requests_total', 'Requests').inc()
+    text = web_registry.render_multiprocess(str(tmp_path))
+    assert_parseable(text)
+    assert 'test_ingest_duration_seconds_bucket{le="60"} 1' in text
+    assert 'test_ingest_duration_seconds_count 1' in text
+    assert 'test_ingest_last_run_timestamp_seconds{pid="ingest"} 1729150000' in text
+    assert 'test_requests_total 1' in text
+
+
+def test_render_counters_and_histograms(monkeypatch):
+    monkeypatch.setattr(metrics, 'MULTIPROC_DIR', None)
+    registry = metrics.metrics_registry()
+    requests_total = registry.counter('test_requests_total', 'Requests', ['route', 'status'])
+    requests_total.inc(route='/steam_api/game_list', status=200)
+    requests_total.inc(2, route='/steam_api/game_list', status=200)
+    duration = registry.histogram('test_duration_seconds', 'Duration', ['route'], buckets=(0.1, 1))
+    duration.observe(0.05, route='/a"b')
+    duration.observe(0.5, route='/a"b')
+    text = registry.render()
+    assert_parseable(text)
+    assert '# TYPE test_requests_total counter' in text
+    assert 'test_requests_total{route="/steam_api/game_list",status="200"} 3' in text
+    # buckets are cumulative, label values are escaped
+    assert 'test_duration_seconds_bucket{route="/a\\"b",le="0.1"} 1' in text
+    assert 'test_duration_seconds_bucket{route="/a\\"b",le="1"} 2' in text
+    assert 'test_duration_seconds_bucket{route="/a\\"b",le="+Inf"} 2' in text
+    assert 'test_duration_seconds_count{route="/a\\"b"} 2' in text
+
+
+def test_render_multiprocess_sums_counters_across_workers(tmp_path):
+    for requests in (2, 3):
+        worker = metrics.metrics_registry()
+        worker.counter('test_requests_total', 'Requests').inc(requests)
+        worker.gauge('test_pool_idle', 'Idle connections').set(requests)
+        worker.flush(str(tmp_path), process_name=f'worker{requests}')
+    text = metrics.metrics_registry().render_multiprocess(str(tmp_path))
+    assert_parseable(text)
+    assert 'test_requests_total 5' in text
+    assert 'test_pool_idle{pid="worker2"} 2' in text
+    assert 'test_pool_idle{pid="worker3"} 3' in text
@@ -0,0 +1,42 @@
+from services.name_index import name_index
+
+
+GAMES = [
+    (730, 'Counter-Strike: Global Offensive'),
+    (10, 'Counter-Strike'),
+    (240, 'Counter-Strike: Source'),
+    (570, 'Dota 2'),
+    (440, 'Team Fortress 2'),
+    (1, ''),
+]
+
+
+def build_index():
+    index = name_index()
+    assert index.swap(index.build(GAMES)) == 5
+    return index
+
+
+def test_prefix_matches_names_before_later_words():
+    index = build_index()
+    assert index.search('counter', mode='prefix') == [(10, 'Counter-Strike'), (730, 'Counter-Strike: Global Offensive'), (240, 'Counter-Strike: Source')]
+    assert index.search('fortress', mode='prefix') == [(440, 'Team Fortress 2')]
+
+
+def test_prefix_ignores_case_and_punctuation():
+    assert build_index().search('COUNTER STRIKE: GLOBAL', mode='prefix') == [(730, 'Counter-Strike: Global Offensive')]
+
+
+def test_fuzzy_tolerates_typos():
+    assert build_index().search('dotta', mode='fuzzy', limit=1) == [(570, 'Dota 2')]
+
+
+def test_auto_tops_up_prefix_matches_with_fuzzy_ones():
+    results = build_index().search('team fortres', mode='auto', limit=3)
+    assert results[0] == (440, 'Team Fortress 2')
+
+
+def test_limit_and_empty_query():
+    index = build_index()
+    assert len(index.search('counter', mode='prefix', limit=2)) == 2
+    assert index.search('  ::  ') == []
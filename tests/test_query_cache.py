@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from database.query_cache import query_cache
+
+
+def counting_loader(results):
+    calls = []
+
+    def query_data(table_name, conditions=None):
+        calls.append((table_name, conditions))
+        return results.pop(0)
+    return query_data, calls
+
+
+def test_wrap_caches_by_arguments():
+    cache = query_cache(maxsize=10, ttl=60)
+    query_data, calls = counting_loader([['a'], ['b']])
+    cached = cache.wrap(query_data)
+    assert cached('games', conditions={'appid': 1}) == ['a']
+    assert cached('games', conditions={'appid': 1}) == ['a']
+    assert cached('games', conditions={'appid': 2}) == ['b']
+    assert len(calls) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_empty_results_are_not_cached():
+    cache = query_cache()
+    query_data, calls = counting_loader([[], ['a']])
+    cached = cache.wrap(query_data)
+    assert cached('games') == []
+    assert cached('games') == ['a']
+    assert len(calls) == 2
+
+
+def test_lru_eviction_and_ttl_expiry():
+    cache = query_cache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+    expiring = query_cache(ttl=0.01)
+    expiring.set('a', 1)
+    time.sleep(0.02)
+    assert expiring.get('a') is None
+    assert expiring.stats()['expirations'] == 1
+
+
+def test_bump_generation_drops_entries_and_stale_loads():
+    cache = query_cache()
+    cache.set('a', 1)
+    generation = cache.generation
+    assert cache.bump_generation() == generation + 1
+    assert cache.get('a') is None
+    # a value loaded before the bump must not be stored after it
+    cache.set('b', 2, generation=generation)
+    assert cache.get('b') is None
+
+
+def test_wrap_async():
+    cache = query_cache()
+    calls = []
+
+    async def query_column(table_name, column):
+        calls.append(column)
+        return ['FPS']
+
+    cached = cache.wrap_async(query_column)
+
+    async def run():
+        return [await cached('game_tags', 'tag_name') for _ in range(3)]
+
+    assert asyncio.run(run()) == [['FPS']] * 3
+    assert calls == ['tag_name']
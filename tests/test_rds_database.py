@@ -0,0 +1,162 @@
+import datetime
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("pymysql")
+
+import pymysql
+
+from database.rds_database import rds_database
+
+
+# Stands in for connection_pool: every cursor runs fake_cursor, each SELECT reads the next of the given rows
+class fake_pool:
+    def __init__(self, results=None, error=None):
+        self.results = list(results or [])
+        self.error = error
+        self.statements = []
+        self.transactions = []
+
+    @contextmanager
+    def cursor(self, cursor_class=None):
+        yield fake_cursor(self)
+
+    @contextmanager
+    def connection(self):
+        yield fake_connection(self)
+
+    def close_all(self):
+        pass
+
+
+class fake_connection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def begin(self):
+        self.pool.transactions.append('begin')
+
+    def commit(self):
+        self.pool.transactions.append('commit')
+
+    def rollback(self):
+        self.pool.transactions.append('rollback')
+
+    def cursor(self, cursor_class=None):
+        return fake_cursor(self.pool)
+
+
+class fake_cursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = []
+        self.description = []
+        self.rowcount = 0
+
+    def execute(self, sql, values=None):
+        self.pool.statements.append((sql, values))
+        if self.pool.error is not None:
+            raise self.pool.error
+        self.rows = self.pool.results.pop(0) if sql.startswith("SELECT") and self.pool.results else []
+        self.rowcount = len(self.rows)
+        return self.rowcount
+
+    def executemany(self, sql, values):
+        self.pool.statements.append((sql, list(values)))
+        if self.pool.error is not None:
+            raise self.pool.error
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def database():
+    database = rds_database()
+    database.pool = fake_pool()
+    return database
+
+
+def test_pagination_reads_raise_database_errors(database):
+    database.pool.error = pymysql.err.OperationalError(2003, "Can't connect")
+    for read in (lambda: database.query_top_100_game(limit=10), database.count_top_100_game,
+                 lambda: database.query_game_ids_by_tag(1, limit=10), lambda: database.count_games_by_tag(1)):
+        with pytest.raises(pymysql.err.OperationalError):
+            read()
+
+
+def test_keyset_pagination_continues_after_the_last_appid(database):
+    database.pool.results = [[(1,), (2,)]]
+    assert database.query_game_ids_by_tag(5, limit=2, offset=40, after=730) == [1, 2]
+    sql, values = database.pool.statements[-1]
+    assert "appid > %s" in sql
+    # after replaces the offset
+    assert values == [5, 730, 2, 0]
+
+
+def test_export_breaks_equal_tag_weights_by_tag_id(database):
+    database.pool.results = [[
+        (730, 'Counter-Strike 2', 2, None, None, 9, 'Shooter', 500.0),
+        (730, 'Counter-Strike 2', 2, None, None, 3, 'FPS', 500.0),
+        (730, 'Counter-Strike 2', 2, None, None, 7, 'Co-op', None),
+        (730, 'Counter-Strike 2', 2, None, None, 1, 'Competitive', 900.0),
+        (10, 'Counter-Strike', 46, None, None, None, None, None),
+    ]]
+    games = list(database.iter_game_export())
+    assert [tag['tag_name'] for tag in games[0]['tags']] == ['Competitive', 'FPS', 'Shooter', 'Co-op']
+    assert games[1] == {"appid": 10, "name": 'Counter-Strike', "ranking": 46, "detail_fetched_at": None, "last_changed_at": None, "tags": []}
+
+
+def test_diff_tag_links_writes_only_changed_links(database):
+    database.pool.results = [
+        # known tags, matched case-insensitively
+        [('moba', 2), ('Free to Play', 1)],
+        # the new tag after its insert
+        [('Strategy', 5)],
+        # stored links
+        [(570, 1, 9123.0), (570, 2, 4000.0), (570, 3, 50.0), (730, 1, 10.0)],
+    ]
+    cursor = fake_cursor(database.pool)
+    changed, removed = database._diff_tag_links(cursor, {570: {'MOBA': 4210, 'Free to Play': 9123, 'Strategy': 100}, 730: {}})
+    assert changed == [(570, 2, 4210), (570, 5, 100)]
+    assert removed == [(570, 3), (730, 1)]
+    assert ("INSERT INTO game_tags (tag_name) VALUES (%s)", ['Strategy']) in database.pool.statements
+
+
+def test_apply_top_100_changes_marks_only_changed_games(database):
+    checked_at = datetime.datetime(2024, 10, 15, 8, 0)
+    database.pool.results = [
+        # stored name and ranking of the refetched game, unchanged
+        [(570, 'Dota 2', 1)],
+        [('MOBA', 2)],
+        [(570, 2, 4210.0)],
+    ]
+    games = [{'appid': 570, 'name': 'Dota 2', 'ranking': 1, 'detail_fetched_at': checked_at, 'detail_etag': '"a"', 'detail_last_modified': None}]
+    stats = {}
+    result = database.apply_top_100_changes(games, {730: 3}, [10], {570: {'MOBA': 4210}}, checked_appids=[240], checked_at=checked_at, stats=stats)
+    assert result == "Success"
+    assert database.pool.transactions == ['begin', 'commit']
+    assert stats == {'tag_links_changed': 0, 'tag_links_removed': 0}
+    sql, values = database.pool.statements[-1]
+    assert sql.startswith("UPDATE games SET last_changed_at")
+    assert values == [checked_at, 10, 730]
+
+
+def test_apply_top_100_changes_rolls_back_on_errors(database):
+    database.pool.error = pymysql.err.OperationalError(2013, "Lost connection")
+    result = database.apply_top_100_changes([], {730: 3}, [10], {})
+    assert result != "Success"
+    assert database.pool.transactions == ['begin', 'rollback']
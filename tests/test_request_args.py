@@ -0,0 +1,25 @@
+import pytest
+
+from util.request_args import parse_batch_ids
+
+
+def test_query_ids_are_deduped_in_the_requested_order():
+    assert parse_batch_ids('GET', '730, 570,,730', None, max_ids=10) == [730, 570]
+
+
+def test_body_ids():
+    assert parse_batch_ids('POST', None, {"ids": [570, "730"]}, max_ids=10) == [570, 730]
+
+
+@pytest.mark.parametrize('method, query_ids, body, message', [
+    ('GET', None, None, "No ids given"),
+    ('GET', '570,abc', None, "ids must be integers"),
+    ('GET', '1,2,3', None, "At most 2 ids per request"),
+    ('POST', None, None, "No ids given"),
+    ('POST', None, [570], "No ids given"),
+    ('POST', None, {"ids": "570"}, "ids must be a list of integers"),
+    ('POST', None, {"ids": [570, None]}, "ids must be integers"),
+])
+def test_invalid_ids(method, query_ids, body, message):
+    with pytest.raises(ValueError, match=message):
+        parse_batch_ids(method, query_ids, body, max_ids=2)
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from services.similarity_index import similarity_index
+
+
+ROWS = [
+    (10, 46, 'FPS', 5000.0),
+    (10, 46, 'Classic', 3000.0),
+    (240, 80, 'FPS', 4000.0),
+    (240, 80, 'Classic', 2500.0),
+    (730, 2, 'FPS', 9000.0),
+    (730, 2, 'Competitive', 8000.0),
+    (570, 1, 'MOBA', 9000.0),
+    (999, None, None, None),
+]
+
+
+def build_index():
+    index = similarity_index()
+    assert index.swap(index.build(ROWS)) == 5
+    return index
+
+
+def test_most_similar_first_without_the_game_itself():
+    similar = build_index().similar([10], limit=3)[10]
+    assert [appid for appid, _ in similar] == [240, 730]
+    assert similar[0][1] > similar[1][1] > 0
+
+
+def test_batch_and_unknown_appids():
+    results = build_index().similar([10, 570, 12345], limit=1)
+    assert results.keys() == {10, 570}
+    assert results[10] == [(240, pytest.approx(1.0, abs=0.01))]
+    # no other game shares a tag with 570
+    assert results[570] == []
+
+
+def test_games_without_tags_have_no_similar_games():
+    assert build_index().similar([999]) == {999: []}
+
+
+def test_build_does_not_serve_until_swap():
+    index = build_index()
+    state = index.build([(1, 1, 'Racing', 1.0), (2, 2, 'Racing', 2.0)])
+    assert index.similar([1]) == {}
+    index.swap(state)
+    assert index.similar([1]) == {1: [(2, 1.0)]}
+
+
+def test_builds_from_a_one_pass_stream_into_a_sparse_matrix():
+    index = similarity_index()
+    # 2000 games with 3 of 500 tags each
+    rows = ((appid, None, f"tag {(appid * 7 + offset) % 500}", 10.0) for appid in range(2000) for offset in range(3))
+    assert index.swap(index.build(rows)) == 2000
+    stats = index.stats()
+    assert stats["links"] == 6000
+    # a dense float32 matrix would take 2000 * 500 * 4 bytes
+    assert stats["bytes"] < 2000 * 500 * 4 / 10
+    similar = index.similar([0], limit=3)[0]
+    assert len(similar) == 3 and all(score > 0 for _, score in similar)
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from benchmarks.stub_steam_server import stub_steam_server
+from services.steam_api_client import create_session, fetch_changed_game_details
+
+
+@pytest.fixture
+def stub():
+    stub = stub_steam_server(games=20, tags=50, tags_per_game=5, latency_ms=20, seed=1).start()
+    yield stub
+    stub.stop()
+
+
+def test_results_keep_the_requested_order(stub):
+    appids = list(reversed(stub.appids))
+    with create_session(concurrency=8) as session:
+        results = fetch_changed_game_details(session, stub.game_detail_api, appids, concurrency=8, timeout=5)
+
+    assert [detail['appid'] for _, detail, _, _ in results] == appids
+    assert all(status_code == 200 for status_code, _, _, _ in results)
+    assert all(etag for _, _, etag, _ in results)
+
+
+def test_retries_503_with_backoff(stub):
+    stub.fail_first = 2
+    appids = stub.appids[:3]
+    with create_session(concurrency=4, retries=3, backoff_factor=0) as session:
+        results = fetch_changed_game_details(session, stub.game_detail_api, appids, concurrency=4, timeout=5)
+
+    assert [status_code for status_code, _, _, _ in results] == [200, 200, 200]
+    assert all(stub.detail_requests[appid] == 3 for appid in appids)
+
+
+def test_gives_up_after_the_retry_budget(stub):
+    stub.fail_first = 10
+    with create_session(concurrency=1, retries=2, backoff_factor=0) as session:
+        results = fetch_changed_game_details(session, stub.game_detail_api, stub.appids[:1], concurrency=1, timeout=5)
+
+    assert results == [(503, None, None, None)]
+    assert stub.detail_requests[stub.appids[0]] == 3
+
+
+def test_unchanged_games_come_back_as_304_with_their_validators(stub):
+    appids = stub.appids[:5]
+    with create_session(concurrency=4) as session:
+        first = fetch_changed_game_details(session, stub.game_detail_api, appids, concurrency=4, timeout=5)
+        validators = {appid: (etag, last_modified) for appid, (_, _, etag, last_modified) in zip(appids, first)}
+        # one game changed since the first fetch
+        stub.details[appids[0]]['name'] = "Renamed"
+        second = fetch_changed_game_details(session, stub.game_detail_api, appids, validators=validators, concurrency=4, timeout=5)
+
+    assert second[0][0] == 200 and second[0][1]['name'] == "Renamed"
+    assert second[0][2] != validators[appids[0]][0]
+    for appid, (status_code, detail, etag, _) in zip(appids[1:], second[1:]):
+        assert (status_code, detail, etag) == (304, None, validators[appid][0])
+
+
+def test_missing_game_and_unreachable_api(stub):
+    with create_session(concurrency=1, retries=0) as session:
+        assert fetch_changed_game_details(session, stub.game_detail_api, [1], timeout=5) == [(404, None, None, None)]
+
+    closed = stub_steam_server(games=1)
+    detail_api = closed.game_detail_api
+    closed.server.server_close()
+    with create_session(concurrency=1, retries=0) as session:
+        assert fetch_changed_game_details(session, detail_api, [closed.appids[0]], timeout=1) == [(None, None, None, None)]
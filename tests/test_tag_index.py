@@ -0,0 +1,49 @@
+from services.tag_index import tag_index
+
+
+ROWS = [
+    (10, 46, 'FPS', 500.0),
+    (10, 46, 'Classic', 300.0),
+    (240, 80, 'FPS', 200.0),
+    (240, 80, 'Co-op', 900.0),
+    (730, 2, 'FPS', 900.0),
+    (730, 2, 'Co-op', 100.0),
+    (999, None, 'Co-op', None),
+    (1000, 5, None, None),
+]
+
+
+def build_index():
+    index = tag_index()
+    assert index.swap(index.build(ROWS)) == 5
+    return index
+
+
+def test_match_all_orders_by_ranking():
+    assert build_index().query(['fps', 'CO-OP']) == ([730, 240], 2)
+
+
+def test_match_any_puts_unranked_games_last():
+    assert build_index().query(['Co-op'], match='any') == ([730, 240, 999], 3)
+
+
+def test_exclude_and_order_by_weight():
+    index = build_index()
+    assert index.query(['FPS'], exclude=['Classic'], order_by='weight') == ([730, 240], 2)
+    assert index.query(['FPS', 'Co-op'], match='any', order_by='weight') == ([240, 730, 10, 999], 4)
+
+
+def test_exclude_only_and_limit():
+    assert build_index().query([], exclude=['FPS'], order_by='appid', limit=1) == ([999], 2)
+
+
+def test_unknown_tag_matches_nothing():
+    assert build_index().query(['FPS', 'Racing']) == ([], 0)
+
+
+def test_build_does_not_serve_until_swap():
+    index = build_index()
+    state = index.build([(1, 1, 'Racing', 1.0)])
+    assert index.query(['Racing']) == ([], 0)
+    assert index.swap(state) == 1
+    assert index.query(['Racing']) == ([1], 1)
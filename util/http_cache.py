@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+# HTTP caching for read-only routes whose data only changes when the ingest job runs.
+# ETag and Last-Modified are derived from the dataset version instead of the response body,
+# so a matching If-None-Match/If-Modified-Since is answered with 304 before the route runs.
+# version() returns (key, last modified unix time or None), or None while the process does not
+# know which data it serves; those responses get Cache-Control: no-store and no validators.
+# Large responses are compressed with brotli (when installed) or gzip, and the compressed body
+# is kept per (ETag, host, encoding), so a repeated request is not compressed again.
+#
+# Example usage:
+# http_cache(app, version=lambda: ("ingest-run-42", 1729150000))
+class http_cache:
+    def __init__(self, app, version, path_prefix='/steam_api/', excluded_paths=(), max_age=300, min_compress_size=1024, compress_level=6,
+                 compressed_cache_size=256):
+        self.version = version
+        self.path_prefix = path_prefix
+        self.excluded_paths = set(excluded_paths)
+        self.max_age = max_age
+        self.min_compress_size = min_compress_size
+        self.compress_level = compress_level
+        self.compressed_cache_size = compressed_cache_size
+        self._compressed = OrderedDict()  # (etag, host, encoding) -> compressed body
+        self._compressed_lock = threading.Lock()
+        app.before_request(self.check_not_modified)
+        app.after_request(self.finalize_response)
+
+    def is_cacheable(self):
+        return (
+            request.method in ('GET', 'HEAD')
+            and request.path.startswith(self.path_prefix)
+            and request.path not in self.excluded_paths
+        )
+
+    # (etag, last_modified), both None while the version is unknown
+    def current_validators(self):
+        version = self.version()
+        if version is None:
+            return None, None
+        key, updated_at = version
+        digest = hashlib.sha1(f"{key}:{request.full_path}".encode()).hexdigest()[:20]
+        return f'W/"{digest}"', None if updated_at is None else int(updated_at)
+
+    def check_not_modified(self):
+        if not self.is_cacheable():
+            return None
+        etag, last_modified = self.current_validators()
+        if etag is None:
+            return None
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            if if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]:
+                return self.not_modified(etag, last_modified)
+            return None
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since and last_modified is not None:
+            try:
+                if parsedate_to_datetime(if_modified_since).timestamp() >= last_modified:
+                    return self.not_modified(etag, last_modified)
+            except (TypeError, ValueError):
+                pass
+        return None
+
+    def not_modified(self, etag, last_modified):
+        response = current_app.response_class(status=304)
+        self.add_validators(response, etag, last_modified)
+        return response
+
+    def add_validators(self, response, etag, last_modified):
+        response.vary.add('Accept-Encoding')
+        if etag is None:
+            # served before this process knew its data version, must not be reused
+            response.headers['Cache-Control'] = 'no-store'
+            return
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+        response.headers['Cache-Control'] = f"public, max-age={self.max_age}"
+
+    def finalize_response(self, response):
+        if not self.is_cacheable() or response.status_code != 200:
+            return response
+        etag, last_modified = self.current_validators()
+        self.add_validators(response, etag, last_modified)
+        return self.compress(response, etag)
+
+    def compress(self, response, etag=None):
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        if response.content_length is not None and response.content_length < self.min_compress_size:
+            return response
+        encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+        if encoding is None:
+            return response
+        # the body is fixed by the ETag (data version and full path) and the host in its links
+        cache_key = (etag, request.host, encoding) if etag is not None else None
+        compressed = self._cached_compressed(cache_key)
+        if compressed is None:
+            data = response.get_data()
+            if len(data) < self.min_compress_size:
+                return response
+            if encoding == 'br':
+                compressed = brotli.compress(data, quality=min(self.compress_level, 11))
+            else:
+                compressed = gzip.compress(data, compresslevel=self.compress_level)
+            self._cache_compressed(cache_key, compressed)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _cached_compressed(self, cache_key):
+        if cache_key is None:
+            return None
+        with self._compressed_lock:
+            compressed = self._compressed.get(cache_key)
+            if compressed is not None:
+                self._compressed.move_to_end(cache_key)
+            return compressed
+
+    def _cache_compressed(self, cache_key, compressed):
+        if cache_key is None or self.compressed_cache_size <= 0:
+            return
+        with self._compressed_lock:
+            self._compressed[cache_key] = compressed
+            self._compressed.move_to_end(cache_key)
+            while len(self._compressed) > self.compressed_cache_size:
+                self._compressed.popitem(last=False)
+
+    def stats(self):
+        with self._compressed_lock:
+            return {"compressed_entries": len(self._compressed), "compressed_bytes": sum(len(body) for body in self._compressed.values())}
@@ -0,0 +1,373 @@
+import atexit
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+INGEST_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800)
+# Multi-process servers (gunicorn workers) point this at a directory shared by all processes of one
+# server; each process writes its metrics there and /metrics renders the sum over every process
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 5)) # how often each process writes its metrics to MULTIPROC_DIR
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+# Prometheus only parses numbers: booleans are sent as 1/0, None as NaN and anything else raises,
+# so render can drop the one collector that returned it instead of sending an unparseable scrape
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if not isinstance(value, (int, float)):
+        raise TypeError(f"metric value must be a number, got {type(value).__name__}")
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class counter:
+    type_name = 'counter'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        values = self.values()
+        return [(self.name, _format_labels(self.label_names, key), value) for key, value in sorted(values.items())]
+
+
+class gauge(counter):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+
+class histogram:
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def values(self):
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+    def samples(self):
+        return _histogram_samples(self.name, self.label_names, self.buckets, self.values())
+
+
+def _histogram_samples(name, label_names, buckets, values):
+    samples = []
+    for key, state in sorted(values.items()):
+        for index, bound in enumerate(buckets):
+            samples.append((f"{name}_bucket", _format_labels(label_names, key, [('le', _format_value(bound))]), state[index]))
+        samples.append((f"{name}_bucket", _format_labels(label_names, key, [('le', '+Inf')]), state[-1]))
+        samples.append((f"{name}_sum", _format_labels(label_names, key), state[-2]))
+        samples.append((f"{name}_count", _format_labels(label_names, key), state[-1]))
+    return samples
+
+
+def _merge_value(type_name, current, value):
+    if current is None:
+        return value
+    if type_name == 'histogram':
+        return [total + part for total, part in zip(current, value)]
+    return current + value
+
+
+# Collects metrics and renders them in the Prometheus text exposition format.
+# Collectors are callables returning {labels tuple: value}, read at scrape time (e.g. cache stats).
+class metrics_registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(histogram(name, help_text, label_names, buckets))
+
+    # a collector added again under the same name replaces the previous one (e.g. a second create_app)
+    def add_collector(self, name, help_text, type_name, label_names, collect):
+        with self._lock:
+            self._collectors = [collector for collector in self._collectors if collector[0] != name]
+            self._collectors.append((name, help_text, type_name, tuple(label_names), collect))
+
+    def render(self):
+        if MULTIPROC_DIR:
+            return self.render_multiprocess(MULTIPROC_DIR)
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        for name, help_text, type_name, label_names, collect in collectors:
+            try:
+                samples = [f"{name}{_format_labels(label_names, key)} {_format_value(value)}" for key, value in sorted(collect().items())]
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {type_name}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    # {name: {"type", "help", "labels", "buckets", "values": [[labels, value], ...]}} of this process,
+    # collectors are read now and stored as gauges
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = {}
+        for metric in metrics:
+            families[metric.name] = {
+                "type": metric.type_name, "help": metric.help_text, "labels": list(metric.label_names),
+                "buckets": list(getattr(metric, 'buckets', ())), "values": [[list(key), value] for key, value in metric.values().items()],
+            }
+        for name, help_text, type_name, label_names, collect in collectors:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            families[name] = {"type": type_name, "help": help_text, "labels": list(label_names), "buckets": [],
+                              "values": [[list(key), value] for key, value in values.items()]}
+        return families
+
+    # Write this process's snapshot to <directory>/metrics_<pid>.json (replaced atomically, so a
+    # concurrent render never reads half a file). A process_name replaces the pid, so a process that
+    # is restarted (e.g. ingest_worker.py) keeps writing the same file and the same gauge series.
+    def flush(self, directory=None, process_name=None):
+        directory = directory or MULTIPROC_DIR
+        path = os.path.join(directory, f"metrics_{process_name or os.getpid()}.json")
+        # one temporary file per thread, a scrape and the flush thread may write at the same time
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary_path, path)
+
+    # Render the metrics of every process that wrote to the directory: counters and histograms are
+    # summed (files of exited processes are kept, so the totals never go backwards), gauges get a
+    # pid label and are only kept for live processes (see mark_process_dead)
+    def render_multiprocess(self, directory):
+        self.flush(directory)
+        merged = {}
+        for path in sorted(glob.glob(os.path.join(directory, 'metrics_*.json'))):
+            pid = os.path.basename(path)[len('metrics_'):-len('.json')]
+            try:
+                with open(path) as file:
+                    families = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, family in families.items():
+                target = merged.setdefault(name, {**family, "values": {}})
+                for key, value in family["values"]:
+                    key = tuple(key)
+                    if family["type"] == 'gauge':
+                        target["values"][key + (pid,)] = value
+                    else:
+                        target["values"][key] = _merge_value(family["type"], target["values"].get(key), value)
+
+        lines = []
+        for name, family in merged.items():
+            if family["type"] == 'histogram':
+                samples = _histogram_samples(name, family["labels"], family["buckets"], family["values"])
+            else:
+                label_names = family["labels"] + (['pid'] if family["type"] == 'gauge' else [])
+                samples = [(name, _format_labels(label_names, key), value) for key, value in sorted(family["values"].items())]
+            try:
+                samples = [f"{sample_name}{labels} {_format_value(value)}" for sample_name, labels, value in samples]
+            except TypeError:
+                continue
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = metrics_registry()
+
+http_request_duration = registry.histogram('steam_api_http_request_duration_seconds', 'HTTP request latency by route', ['method', 'route'])
+http_requests_total = registry.counter('steam_api_http_requests_total', 'HTTP requests by route and status', ['method', 'route', 'status'])
+http_request_sql_statements = registry.histogram('steam_api_http_request_sql_statements', 'SQL statements executed per HTTP request', ['route'], buckets=STATEMENT_BUCKETS)
+db_method_duration = registry.histogram('steam_api_db_method_duration_seconds', 'rds_database method latency', ['method'])
+db_method_errors_total = registry.counter('steam_api_db_method_errors_total', 'rds_database method calls that raised', ['method'])
+db_statements_total = registry.counter('steam_api_db_statements_total', 'SQL statements sent to the database')
+ingest_duration = registry.histogram('steam_api_ingest_duration_seconds', 'fetch_steam_api_data run duration', buckets=INGEST_BUCKETS)
+ingest_stage_duration = registry.histogram('steam_api_ingest_stage_duration_seconds', 'fetch_steam_api_data duration per stage', ['stage'], buckets=INGEST_BUCKETS)
+ingest_last_stage_duration = registry.gauge('steam_api_ingest_last_stage_duration_seconds', 'Duration of each stage in the last fetch_steam_api_data run', ['stage'])
+ingest_last_run_timestamp = registry.gauge('steam_api_ingest_last_run_timestamp_seconds', 'Unix time the last fetch_steam_api_data run finished')
+
+
+# SQL statement counting for the request being handled on this thread
+_request_state = threading.local()
+
+
+def start_request():
+    _request_state.sql_statements = 0
+
+
+def finish_request():
+    statements = getattr(_request_state, 'sql_statements', None)
+    _request_state.sql_statements = None
+    return statements
+
+
+def record_sql_statement():
+    db_statements_total.inc()
+    if getattr(_request_state, 'sql_statements', None) is not None:
+        _request_state.sql_statements += 1
+
+
+# Example usage:
+# @timed_db_method
+# def query_data(self, ...):
+def timed_db_method(method):
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            db_method_errors_total.inc(method=method.__name__)
+            raise
+        finally:
+            db_method_duration.observe(time.perf_counter() - start, method=method.__name__)
+    return timed
+
+
+# Example usage:
+# with ingest_stage('fetch_details'):
+#     ...
+@contextmanager
+def ingest_stage(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        ingest_stage_duration.observe(duration, stage=stage)
+        ingest_last_stage_duration.set(duration, stage=stage)
+
+
+# Multi-process mode (METRICS_MULTIPROC_DIR), called from the gunicorn hooks in gunicorn.conf.py
+
+# remove the files of the previous server run, in the master before any worker starts
+def clear_multiprocess_dir(directory=None):
+    directory = directory or MULTIPROC_DIR
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json*')):
+        os.remove(path)
+
+
+_flush_pid = None
+
+
+# write this process's metrics every FLUSH_SECONDS and once more at exit, once per process
+def start_flush_thread(directory=None, process_name=None):
+    global _flush_pid
+    directory = directory or MULTIPROC_DIR
+    if not directory or _flush_pid == os.getpid():
+        return False
+    _flush_pid = os.getpid()
+
+    def flush_forever():
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            try:
+                registry.flush(directory, process_name)
+            except OSError:
+                pass
+
+    os.makedirs(directory, exist_ok=True)
+    registry.flush(directory, process_name)
+    atexit.register(registry.flush, directory, process_name)
+    threading.Thread(target=flush_forever, name="metrics-flush", daemon=True).start()
+    return True
+
+
+# drop the gauges of an exited process, its counters and histograms stay in the totals
+def mark_process_dead(pid, directory=None):
+    path = os.path.join(directory or MULTIPROC_DIR, f"metrics_{pid}.json")
+    try:
+        with open(path) as file:
+            families = json.load(file)
+    except (OSError, ValueError):
+        return
+    families = {name: family for name, family in families.items() if family["type"] != 'gauge'}
+    with open(f"{path}.tmp", 'w') as file:
+        json.dump(families, file)
+    os.replace(f"{path}.tmp", path)
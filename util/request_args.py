@@ -0,0 +1,28 @@
+# Request argument parsing shared by app.py and async_app.py
+
+
+# Batch ids of /steam_api/game_details and /steam_api/similar: a comma separated "ids" query parameter
+# (GET) or the "ids" list of the JSON body (POST), deduped in the requested order.
+# Raises ValueError with the message of the 400 response.
+#
+# Example usage:
+# parse_batch_ids('GET', '570,730,570', None, max_ids=100)
+# [570, 730]
+def parse_batch_ids(method, query_ids, body, max_ids):
+    if method == 'POST':
+        body = body or {}
+        raw_ids = body.get('ids', []) if isinstance(body, dict) else []
+        # a string would be read one character at a time
+        if not isinstance(raw_ids, list):
+            raise ValueError("ids must be a list of integers")
+    else:
+        raw_ids = [game_id for game_id in (query_ids or '').split(',') if game_id.strip()]
+    try:
+        game_ids = list(dict.fromkeys(int(game_id) for game_id in raw_ids))
+    except (TypeError, ValueError):
+        raise ValueError("ids must be integers")
+    if not game_ids:
+        raise ValueError("No ids given")
+    if len(game_ids) > max_ids:
+        raise ValueError(f"At most {max_ids} ids per request")
+    return game_ids
@@ -0,0 +1,76 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+
+# Formats a record as one JSON object per line; structured fields are passed as extra={"fields": {...}}
+class json_formatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Plain text variant that appends structured fields as key=value pairs
+class text_formatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(levelname)s:%(name)s:%(message)s')
+
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+_listener = None
+
+
+# Route all logging through a queue so request threads only enqueue records;
+# a background listener thread does the formatting and the blocking stream writes.
+#
+# Example usage:
+# configure_logging(level=logging.INFO, log_format='json')
+def configure_logging(level=logging.INFO, log_format='json'):
+    global _listener
+    if _listener is not None:
+        return
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(json_formatter() if log_format == 'json' else text_formatter())
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+# The listener thread does not survive fork, start a new one in the child (e.g. gunicorn post_fork)
+def restart_logging_after_fork():
+    global _listener
+    if _listener is None:
+        return
+    _listener = logging.handlers.QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        # flushes the records still in the queue
+        _listener.stop()
+        _listener = None